@@ -1,39 +1,30 @@
+import time
+
 import streamlit as st
 import pandas as pd
 from utils.util import format_price
-from utils.database import get_db_connection
+from utils.money import RATE_SCALE
+from utils.tax import get_tax_table
+from utils.catalog import get_menu_catalog, resolve_line_modifiers
+from utils.database import get_db_connection, get_last_event_seq, get_events_since
+from utils.notify import get_order_hub
 from utils.style import load_css
-from streamlit_autorefresh import st_autorefresh
+from utils.querylog import query_log_panel
+from utils.profiler import profile_page, phase
 
+# Order status shown on the customer display
+CFD_ORDER_STATUS = 10
 
-# ── Data fetchers ────────────────────────────────────────────────────────────
+# How often the display checks the order hub for changes (in memory, no query)
+CFD_CHECK_SECONDS = 1
 
-def get_modifiers_details(modifier_ids):
-    """Return a list of modifier dicts given a modifier id string/list."""
-    if not modifier_ids:
-        return []
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        # modifier_ids may be a comma-separated string or already a list
-        if isinstance(modifier_ids, str):
-            ids = [m.strip() for m in modifier_ids.split(",") if m.strip()]
-        else:
-            ids = list(modifier_ids)
-        if not ids:
-            return []
-        placeholders = ",".join("?" * len(ids))
-        cursor.execute(
-            f"SELECT description, price FROM Modifier WHERE modifier_id IN ({placeholders})",
-            ids,
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        return [{"description": r[0], "price": r[1]} for r in rows]
-    except Exception:
-        return []
+# Without any order change the display still refreshes this often
+CFD_IDLE_REFRESH_SECONDS = 30
 
 
+# ── Data fetchers ────────────────────────────────────────────────────────────
+
+@phase("db")
 def get_order_details():
     """Fetch the active order from Order_Cart / Order_Product (order_status = 10)."""
     try:
@@ -42,21 +33,24 @@ def get_order_details():
         cursor.execute("""
             SELECT
                 oc.order_id,
-                oc.subtotal,
+                oc.subtotal + oc.modifier_total AS order_subtotal,
+                oc.tax          AS order_tax,
                 op.product_id,
-                op.modifiers,
-                pi.description  AS product_description,
+                op.order_product_id,
                 op.product_quantity,
-                pi.price        AS product_price,
-                pi.tax          AS tax
+                op.unit_price   AS product_price,
+                op.tax_rate     AS tax
             FROM Order_Cart oc
             LEFT JOIN Order_Product op ON oc.order_id = op.order_id
-            LEFT JOIN Product pi       ON op.product_id = pi.product_id
             WHERE oc.order_status = 10
-            ORDER BY oc.order_id, pi.description
+            ORDER BY oc.order_id, op.order_product_id
         """)
         columns = [col[0] for col in cursor.description]
+        # Descriptions come from the in-memory menu instead of a Product join
+        catalog = get_menu_catalog()
         rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            row["product_description"] = catalog.product_name(row["product_id"])
         conn.close()
         return rows
     except Exception:
@@ -65,30 +59,28 @@ def get_order_details():
 
 # ── Display helpers ──────────────────────────────────────────────────────────
 
-DEFAULT_TAX_RATE = 4.712
-
 def _display_from_order_details(order_data):
     """Render the CFD from Order_Cart / Order_Product data."""
     orders = {}
     subtotal = 0
     tax_amount = 0
+    line_products, line_rates = [], []
+
+    # Modifiers for every line, resolved in one pass
+    line_modifiers = resolve_line_modifiers(order_data)
 
-    for row in order_data:
+    for row, (modifiers, modifier_total_price) in zip(order_data, line_modifiers):
         order_id = row["order_id"]
         if order_id not in orders:
             orders[order_id] = []
+            # Order totals are kept current on Order_Cart; no re-aggregation here
+            subtotal += row["order_subtotal"] or 0
+            tax_amount += row["order_tax"] or 0
 
         if row.get("product_id"):
-            modifiers = get_modifiers_details(row.get("modifiers"))
-            modifier_total_price = sum(mod["price"] for mod in modifiers)
             item_total = (row["product_price"] + modifier_total_price) * row["product_quantity"]
-
-            try:
-                tax_rate = row["tax"] if row["tax"] is not None else DEFAULT_TAX_RATE
-            except (KeyError, TypeError):
-                tax_rate = DEFAULT_TAX_RATE
-
-            item_tax = item_total * (tax_rate / 100)
+            line_products.append(row["product_id"])
+            line_rates.append(row["tax"])
 
             orders[order_id].append({
                 "description": row["product_description"],
@@ -97,13 +89,10 @@ def _display_from_order_details(order_data):
                 "modifiers": modifiers,
                 "modifier_total": modifier_total_price,
                 "item_total": item_total,
-                "tax_rate": tax_rate,
-                "item_tax": item_tax,
             })
 
-            subtotal += item_total
-            tax_amount += item_tax
-
+    # Tax as stored on Order_Cart, the amount Checkout charges; the lines' rates for the label
+    tax_rates = set(get_tax_table().line_units(line_products, line_rates).tolist())
     total = subtotal + tax_amount
 
     # st.subheader(f'Order: {", ".join(str(k) for k in orders.keys())}')
@@ -131,12 +120,13 @@ def _display_from_order_details(order_data):
         with st.container(height=500, border=True):
             st.dataframe(df.set_index(df.columns[0]), width='stretch')
 
-        display_tax_rate = orders[list(orders.keys())[-1]][-1]["tax_rate"]
+        # The rate is shown when every line has the same one
+        tax_label = f"Tax ({tax_rates.pop() / RATE_SCALE:.3f}%)" if len(tax_rates) == 1 else "Tax"
         col1, col2, col3 = st.columns(3)
         with col1:
             st.markdown(f"**Subtotal: {format_price(subtotal)}**")
         with col2:
-            st.markdown(f"**Tax ({display_tax_rate:.3f}%): {format_price(tax_amount)}**")
+            st.markdown(f"**{tax_label}: {format_price(tax_amount)}**")
         with col3:
             st.markdown(f"**Total: {format_price(total)}**")
     else:
@@ -145,6 +135,7 @@ def _display_from_order_details(order_data):
 
 # ── Main entry point ─────────────────────────────────────────────────────────
 
+@profile_page("CFD")
 def display_cfd():
     st.set_page_config(
         page_title="Customer Display",
@@ -160,13 +151,45 @@ def display_cfd():
         order_data = get_order_details()
         if order_data:
             _display_from_order_details(order_data)
-            return
+            return {row["order_id"] for row in order_data}
 
         # 3. Nothing to show
         st.info("Welcome! Please start your order.")
+        return set()
+
+
+def watch_order_events():
+    """Keep the order hub's watcher running for this session (utils/notify.py)."""
+    if "cfd_hub_watch" not in st.session_state:
+        st.session_state.cfd_hub_watch = get_order_hub().watch()
+
+
+@st.fragment(run_every=CFD_CHECK_SECONDS)
+def refresh_on_display_change(shown_order_ids, shown_at):
+    """
+    Rerun the display when an order on (or arriving on) it changed, or after
+    the idle timeout. Runs as a timed fragment so the script thread is free
+    between checks. A check compares the hub's newest event with the last
+    one checked, in memory; Order_Event is read only after the hub saw new events.
+    """
+    def affects_display(event):
+        return event["order_id"] in shown_order_ids or event["order_status"] == CFD_ORDER_STATUS
+
+    checked_seq = st.session_state.cfd_checked_seq
+    if (get_order_hub().last_seq or 0) > checked_seq:
+        events = get_events_since(checked_seq)
+        if events:
+            st.session_state.cfd_checked_seq = events[-1]["event_seq"]
+        if any(affects_display(event) for event in events):
+            st.rerun()
+    if time.monotonic() - shown_at >= CFD_IDLE_REFRESH_SECONDS:
+        st.rerun()
 
 
 if __name__ == "__main__":
-    st_autorefresh(interval=1000, limit=None, key="cfd_refresh")
-    display_cfd()
- 
\ No newline at end of file
+    watch_order_events()
+    # Taken before reading the order so no change can slip in between
+    st.session_state.cfd_checked_seq = get_last_event_seq()
+    shown_order_ids = display_cfd()
+    query_log_panel()
+    refresh_on_display_change(shown_order_ids, time.monotonic())
@@ -1,7 +1,9 @@
 import streamlit as st
-from datetime import datetime
-from utils.database import get_db_connection
+import sqlite3
+from utils.database import write
+from utils.floor import get_floor_state, session_claim_token, claim_area, release_area, AREA_AVAILABLE
 from utils.style import load_css 
+from utils.querylog import query_log_panel
 
 # Page configuration
 st.set_page_config(
@@ -10,90 +12,94 @@ st.set_page_config(
     layout="wide"
 )
 
-# Function to get all service areas
-def get_service_areas():
-    """Fetch all service areas from database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT service_area_id, description, status FROM Service_Area ORDER BY service_area_id')
-    areas = cursor.fetchall()
-    conn.close()
-    return areas
-
-# Function to update service area status
-def update_service_area_status(service_area_id):
-    """Update service area status to occupied (1)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    timestamp = datetime.now().isoformat()
-    cursor.execute(
-        'UPDATE Service_Area SET status = 1, timestamp = ? WHERE service_area_id = ?',
-        (timestamp, service_area_id)
-    )
-    conn.commit()
-    conn.close()
+# Function to claim a service area
+def claim_service_area(service_area_id):
+    """Seat the area for this session unless someone else got it first; returns True if claimed"""
+    return write(claim_area, service_area_id, session_claim_token())
 
 # Function to reset specific service area status
 def reset_specific_service_area(service_area_id):
     """Reset specific service area status to available (0)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE Service_Area SET status = 0, timestamp = NULL WHERE service_area_id = ?', (service_area_id,))
-    conn.commit()
-    conn.close()
+    write(release_area, service_area_id)
 
 # Main page content
 load_css()
 st.title("🍽️ Service Area Selection")
 st.markdown("### Please select a table or seating area")
 
-# Get service areas
-service_areas = get_service_areas()
+# A table another server seated first, between our render and the tap
+taken = st.session_state.pop("claim_taken", None)
+if taken is not None:
+    st.warning(f"Service area {taken} was just taken by another server. Please pick another one.")
 
-# Create a grid layout for buttons
-col1, col2, col3 = st.columns(3)
+# Get service areas (cached; reloaded only when Service_Area changes)
+floor = get_floor_state()
+service_areas = floor.areas
+my_token = session_claim_token()
 
-# Display service area buttons in a grid
-for i, area in enumerate(service_areas):
-    service_area_id = area['service_area_id']
-    description = area['description']
-    status = area['status']
-    
-    # Determine button color based on status
-    button_type = "secondary" if status == 0 else "primary"
+def area_button(area):
+    """One service area button: seat it, go back to its order, or show it occupied"""
+    service_area_id = area.service_area_id
+    description = area.description
+    status = area.status
     button_label = f"{service_area_id} - {description}"
-    
-    # Distribute buttons across columns
-    with [col1, col2, col3][i % 3]:
-        # Create button with conditional styling
-        if status == 0:  # Available - Blue
-            if st.button(
-                button_label,
-                key=f"area_{service_area_id}",
-                type="secondary",
-                use_container_width=True
-            ):
-                # Update status to occupied
-                update_service_area_status(service_area_id)
-                
-                # Store selected service area in session state
-                st.session_state.selected_service_area = service_area_id
-                
-                # Navigate to Order page
-                st.switch_page("pages/2_Order.py")
-        else:  # Occupied - Different styling
-            st.button(
-                f"🔴 {service_area_id} - {description} (Occupied)",
-                key=f"occupied_area_{service_area_id}",
-                disabled=True,
-                use_container_width=True
-            )
-            
-            # Store selected service area in session state
+
+    # Create button with conditional styling
+    if status == AREA_AVAILABLE:  # Available - Blue
+        if st.button(
+            button_label,
+            key=f"area_{service_area_id}",
+            type="secondary",
+            use_container_width=True
+        ):
+            try:
+                claimed = claim_service_area(service_area_id)
+            except sqlite3.Error as e:
+                st.error(f"Could not seat service area {service_area_id}: {e}")
+            else:
+                if claimed:
+                    # Store selected service area in session state
+                    st.session_state.selected_service_area = service_area_id
+
+                    # Navigate to Order page
+                    st.switch_page("pages/2_Order.py")
+                st.session_state.claim_taken = service_area_id
+                st.rerun()
+    elif area.claim_token == my_token:  # Seated by this session - back to its order
+        if st.button(
+            f"🟢 {service_area_id} - {description} (Yours)",
+            key=f"own_area_{service_area_id}",
+            type="primary",
+            use_container_width=True
+        ):
             st.session_state.selected_service_area = service_area_id
-            
-            # Navigate to Order page
-            # st.switch_page("pages/2_Order.py")
+            st.switch_page("pages/2_Order.py")
+    else:  # Occupied - Different styling
+        st.button(
+            f"🔴 {service_area_id} - {description} (Occupied)",
+            key=f"occupied_area_{service_area_id}",
+            disabled=True,
+            use_container_width=True
+        )
+
+grid_rows, grid_cols = floor.grid_size()
+if grid_rows:
+    # The floor plan saved in the layout designer, table by table in place
+    placed = floor.placed()
+    for r in range(grid_rows):
+        cols = st.columns(grid_cols)
+        for c in range(grid_cols):
+            area = placed.get((r, c))
+            if area:
+                with cols[c]:
+                    area_button(area)
+else:
+    # No floor plan yet: a plain grid of buttons
+    col1, col2, col3 = st.columns(3)
+    for i, area in enumerate(service_areas):
+        # Distribute buttons across columns
+        with [col1, col2, col3][i % 3]:
+            area_button(area)
 
 # Add some spacing
 st.markdown("---")
@@ -104,7 +110,7 @@ with col_reset2:
     st.markdown("#### Select Service Area to Reset:")
     
     # Get occupied areas for dropdown
-    occupied_areas = [area for area in service_areas if area['status'] == 1]
+    occupied_areas = get_floor_state().occupied()
     
     if occupied_areas:
         # Create dropdown options (only individual service areas)
@@ -113,9 +119,9 @@ with col_reset2:
         
         # Add individual service areas (only occupied ones)
         for area in occupied_areas:
-            display_text = f"{area['service_area_id']} - {area['description']}"
+            display_text = f"{area.service_area_id} - {area.description}"
             dropdown_display.append(display_text)
-            dropdown_options[display_text] = area['service_area_id']
+            dropdown_options[display_text] = area.service_area_id
         
         # Create selectbox
         selected_option = st.selectbox(
@@ -148,9 +154,11 @@ col_legend1, col_legend2 = st.columns(2)
 with col_legend1:
     st.markdown("🟦 **Available** - Ready for seating")
 with col_legend2:
-    st.markdown("🔴 **Occupied** - Currently in use")
+    st.markdown("🔴 **Occupied** - Currently in use (🟢 seated by you)")
 
 # Optional: Display current status summary
-available_count = sum(1 for area in service_areas if area['status'] == 0)
+available_count = sum(1 for area in service_areas if area.status == AREA_AVAILABLE)
 occupied_count = len(service_areas) - available_count
-st.markdown(f"**Summary:** {available_count} available, {occupied_count} occupied")
\ No newline at end of file
+st.markdown(f"**Summary:** {available_count} available, {occupied_count} occupied")
+
+query_log_panel()
\ No newline at end of file
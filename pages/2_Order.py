@@ -1,8 +1,12 @@
 import streamlit as st
 from datetime import datetime
 from utils.util import format_price
-from utils.database import  get_db_connection
+from utils.database import write
+from utils.catalog import get_menu_catalog
+from utils import orders as order_ops
 from utils.style import load_css
+from utils.querylog import query_log_panel
+from utils.profiler import profile_page, phase
 
 
 # Set selected_service_area 
@@ -21,55 +25,25 @@ if 'cart' not in st.session_state:
 if 'order_id' not in st.session_state:
     st.session_state.order_id = None
 
-def get_category():
-    """Get all product groups"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT category_id, description FROM category ORDER BY category_id")
-    groups = cursor.fetchall()
-    conn.close()
-    return groups
-
-def get_Products(group_id):
-    """Get product for a specific category"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT product_id, description, price 
-        FROM Product 
-        WHERE category_id = ?
-        ORDER BY product_id
-    ''', (group_id,))
-    items = cursor.fetchall()
-    conn.close()
-    return items
-
-def get_modifier(product_id):
-    """Get product modifier for a specific product """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT description FROM modifier 
-        WHERE product_id = ?
-    ''', (product_id,))
-    options = cursor.fetchall()
-    conn.close()
-    return options
-
-def add_to_cart(product_id, product_name, price, option):
+def add_to_cart(product_id, product_name, price, modifier=None):
     """Add item to cart or update quantity if already exists"""
+    modifier_id = modifier.modifier_id if modifier else None
+
     # Check if item with same product and option already exists
     for item in st.session_state.cart:
-        if item['product_id'] == product_id and item['option'] == option:
+        if item['product_id'] == product_id and item['modifier_id'] == modifier_id:
             item['quantity'] += 1
             return
     
-    # Add new item
+    # Add new item (price is the unit price including the option)
+    modifier_price = modifier.price if modifier else 0
     st.session_state.cart.append({
         'product_id': product_id,
         'product_name': product_name,
-        'price': price,
-        'option': option,
+        'price': price + modifier_price,
+        'option': modifier.description if modifier else None,
+        'modifier_id': modifier_id,
+        'modifier_price': modifier_price,
         'quantity': 1
     })
 
@@ -84,6 +58,7 @@ def calculate_subtotal():
     """Calculate cart subtotal"""
     return sum(item['price'] * item['quantity'] for item in st.session_state.cart)
 
+@phase("db")
 def create_order():
     """Create order and insert into database"""
     if not st.session_state.cart:
@@ -94,30 +69,11 @@ def create_order():
         st.error("Select a service area to continue.")
         return False
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Create order in Order_Cart
-        cursor.execute('''
-            INSERT INTO Order_Cart (service_area_id, order_status)
-            VALUES (?, 1)
-        ''', (st.session_state.selected_service_area,))
-        
-        order_id = cursor.lastrowid
-        st.session_state.order_id = order_id
-        
-        # Insert items into Order_Product
-        for item in st.session_state.cart:
-            cursor.execute('''
-                INSERT INTO Order_Product (order_id, product_id, product_quantity)
-                VALUES (?, ?, ?)
-            ''', (order_id, item['product_id'], item['quantity']))
-        
-        conn.commit()
+        st.session_state.order_id = write(
+            order_ops.create_order, st.session_state.selected_service_area, st.session_state.cart)
         return True
     except Exception as e:
-        conn.rollback()
         # Check if the error is related to service_area_id NOT NULL constraint
         error_message = str(e)
         if "NOT NULL constraint failed: Order_Cart.service_area_id" in error_message:
@@ -125,9 +81,65 @@ def create_order():
         else:
             st.error(f"Error creating order: {e}")
         return False
-    finally:
-        conn.close()
  
+# ── Cart panel ───────────────────────────────────────────────────────────────
+# A fragment: +/- rerun only the cart (no menu, no database). Adding from the
+# menu reruns the whole page, which redraws the cart too.
+
+@st.fragment
+@profile_page("Order: cart")
+def cart_panel():
+    st.subheader("Order Cart")
+    
+    if st.session_state.cart:
+        # Display cart items
+        for i, item in enumerate(st.session_state.cart):
+            with st.container():
+                cart_col1, cart_col2, cart_col3 = st.columns([3, 2, 2])
+                
+                with cart_col1:
+                    st.write(f"**{item['product_name']}**")
+                    if item['option']:
+                        st.caption(f"Option: {item['option']}")
+                
+                with cart_col2:
+                    quantity_col1, quantity_col2, quantity_col3 = st.columns([1, 1, 1])
+                    with quantity_col1:
+                        st.button("➖", key=f"dec_{i}", help="Decrease quantity",
+                                  on_click=update_quantity, args=(i, -1))
+                    with quantity_col2:
+                        st.write(f"{item['quantity']}")
+                    with quantity_col3:
+                        st.button("➕", key=f"inc_{i}", help="Increase quantity",
+                                  on_click=update_quantity, args=(i, 1))
+                
+                with cart_col3:
+                    st.write(format_price(item['price']))
+                
+                st.divider()
+    else:
+        st.info("Cart is empty")
+    
+    # Subtotal
+    st.divider()
+    subtotal = calculate_subtotal()
+    st.subheader(f"Subtotal: {format_price(subtotal)}")
+    
+    # Checkout button - disabled if no service area selected or cart is empty
+    checkout_disabled = (
+        len(st.session_state.cart) == 0 or 
+        not st.session_state.get('selected_service_area')
+    )
+    
+    if st.button("Checkout", type="primary", width='stretch', disabled=checkout_disabled):
+        if create_order():
+            st.success("Order created successfully!")
+            # Clear cart after successful order
+            st.session_state.cart = []
+            # Navigate to checkout
+            st.switch_page("pages/4_Checkout.py")
+
+@profile_page("Order")
 def show_order_page():
 
     # Page layout
@@ -160,77 +172,30 @@ def show_order_page():
 
     # Left column - Cart
     with col_cart:
-        st.subheader("Order Cart")
-        
-        if st.session_state.cart:
-            # Display cart items
-            for i, item in enumerate(st.session_state.cart):
-                with st.container():
-                    cart_col1, cart_col2, cart_col3 = st.columns([3, 2, 2])
-                    
-                    with cart_col1:
-                        st.write(f"**{item['product_name']}**")
-                        if item['option']:
-                            st.caption(f"Option: {item['option']}")
-                    
-                    with cart_col2:
-                        quantity_col1, quantity_col2, quantity_col3 = st.columns([1, 1, 1])
-                        with quantity_col1:
-                            if st.button("➖", key=f"dec_{i}", help="Decrease quantity"):
-                                update_quantity(i, -1)
-                                st.rerun()
-                        with quantity_col2:
-                            st.write(f"{item['quantity']}")
-                        with quantity_col3:
-                            if st.button("➕", key=f"inc_{i}", help="Increase quantity"):
-                                update_quantity(i, 1)
-                                st.rerun()
-                    
-                    with cart_col3:
-                        st.write(format_price(item['price']))
-                    
-                    st.divider()
-        else:
-            st.info("Cart is empty")
-        
-        # Subtotal
-        st.divider()
-        subtotal = calculate_subtotal()
-        st.subheader(f"Subtotal: {format_price(subtotal)}")
-        
-        # Checkout button - disabled if no service area selected or cart is empty
-        checkout_disabled = (
-            len(st.session_state.cart) == 0 or 
-            not st.session_state.get('selected_service_area')
-        )
-        
-        if st.button("Checkout", type="primary", width='stretch', disabled=checkout_disabled):
-            if create_order():
-                st.success("Order created successfully!")
-                # Clear cart after successful order
-                st.session_state.cart = []
-                # Navigate to checkout
-                st.switch_page("pages/4_Checkout.py")
+        cart_panel()
 
     # Right column - Menu
     with col_menu:
         st.subheader("Menu")
         
-        # Get product groups
-        category = get_category()
+        # Menu comes from the shared in-memory catalog (no queries once warm)
+        with phase("db"):
+            catalog = get_menu_catalog()
+        category = catalog.categories
         
         # Create tabs for product groups
         if category:
-            group_names = [group[1] for group in category]
+            group_names = [group.description for group in category]
             tabs = st.tabs(group_names)
             
             for i, (group_id, group_name) in enumerate(category):
                 with tabs[i]:
                     # Get product items for this group
-                    Products = get_Products(group_id)
+                    Products = catalog.get_products(group_id)
                     
                     # Display product items
-                    for product_id, product_name, price in Products:
+                    for product in Products:
+                        product_id, product_name, price = product.product_id, product.description, product.price
                         with st.container():
                             item_col1, item_col2 = st.columns([3, 1])
                             
@@ -240,25 +205,26 @@ def show_order_page():
                             
                             with item_col2:
                                 # Product options
-                                options = get_modifier(product_id)
-                                option_list = ["No option"] + [opt[0] for opt in options]
+                                options = catalog.get_modifiers(product_id)
+                                option_list = [None] + [opt.modifier_id for opt in options]
 
                                 
                                 # Create unique key for each product's selectbox
                                 selected_option = st.selectbox(
                                     "Option",
                                     option_list,
+                                    format_func=lambda modifier_id: "No option" if modifier_id is None else catalog.modifiers[modifier_id].description,
                                     key=f"option_{product_id}",
                                     label_visibility="collapsed"
                                 )
                                 
-                                if st.button("Add", key=f"add_{product_id}", type="secondary", width='stretch'):
-                                    option_value = None if selected_option == "No option" else selected_option
-                                    add_to_cart(product_id, product_name, price, option_value)
-                                    st.rerun()
+                                st.button("Add", key=f"add_{product_id}", type="secondary", width='stretch',
+                                          on_click=add_to_cart,
+                                          args=(product_id, product_name, price, catalog.modifiers.get(selected_option)))
                             
                             st.divider()
 
 # Run the page
 if __name__ == "__main__":
-    show_order_page()
\ No newline at end of file
+    show_order_page()
+    query_log_panel()
\ No newline at end of file
@@ -2,71 +2,26 @@ import streamlit as st
 import pandas as pd
 import time
 from utils.util import format_price
-from utils.database import  get_db_connection 
+from utils.database import write
+from utils.kds import KdsBoard
+from utils import orders as order_ops
 from utils.style import load_css 
+from utils.querylog import query_log_panel
+from utils.profiler import profile_page, phase
 # from streamlit_autorefresh import st_autorefresh
 
 # Initialize session state for checkbox tracking
 def init_session_state():
     if 'item_states' not in st.session_state:
         st.session_state.item_states = {}
-
-# Get all open orders (order_status = 1)
-def get_open_orders():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT DISTINCT 
-            oc.order_id,
-            oc.service_area_id,
-            oc.order_status,
-            oc.created_at
-        FROM Order_Cart oc
-        INNER JOIN Order_Product op ON oc.order_id = op.order_id
-        WHERE oc.order_status = 1
-        ORDER BY oc.created_at ASC
-    """)
-    
-    orders = cursor.fetchall()
-    conn.close()
-    return orders
-
-# Get order items for a specific order
-def get_order_items(order_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            op.order_id,
-            op.product_id,
-            pi.description as product_name,
-            op.product_quantity
-        FROM Order_Product op
-        INNER JOIN Product pi ON op.product_id = pi.product_id
-        INNER JOIN Order_Cart oc ON op.order_id = oc.order_id
-        WHERE op.order_id = ? AND oc.order_status = 1
-        ORDER BY pi.description
-    """, (order_id,))
-    
-    items = cursor.fetchall()
-    conn.close()
-    return items
+    if 'kds_board' not in st.session_state:
+        st.session_state.kds_board = KdsBoard()
 
 # Confirm order (set order_status to 2)
+@phase("db")
 def confirm_order(order_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("""
-            UPDATE Order_Cart 
-            SET order_status = 2 
-            WHERE order_id = ?
-        """, (order_id,))
-        
-        conn.commit()
+        write(order_ops.confirm_order, order_id)
         # Clean up session state for this order
         keys_to_remove = [key for key in st.session_state.item_states.keys() if key.startswith(f"{order_id}_")]
         for key in keys_to_remove:
@@ -75,8 +30,6 @@ def confirm_order(order_id):
     except Exception as e:
         st.error(f"Error confirming order: {e}")
         return False
-    finally:
-        conn.close()
 
 # Create unique item key for session state
 def create_item_key(order_id, product_id, index):
@@ -130,6 +83,7 @@ def display_order_with_checkboxes(order, items):
             st.rerun()
 
 # Main KDS page
+@profile_page("KDS")
 def show_kds_page():
     st.set_page_config(
         page_title="Kitchen Display System",
@@ -145,8 +99,11 @@ def show_kds_page():
     st.title("🍳 Kitchen Display System")
     st.markdown("---")
 
-    # Get open orders
-    orders = get_open_orders()
+    # Get open orders (one joined query, then only tickets changed since last refresh)
+    board = st.session_state.kds_board
+    with phase("db"):
+        board.refresh()
+        orders = board.open_tickets()
     
     if not orders:
         st.subheader("""
@@ -161,8 +118,8 @@ def show_kds_page():
         col_index = i % 3
         
         with cols[col_index]:
-            # Get items for this order
-            items = get_order_items(order['order_id'])
+            # Items were loaded with the board
+            items = order['items']
             
             if items:  # Only display if order has items
                 display_order_with_checkboxes(order, items)
@@ -174,4 +131,5 @@ def show_kds_page():
 if __name__ == "__main__":
     # Note: The st_autorefresh function is set to refresh the page every 10 seconds to keep the KDS updated.
     # st_autorefresh(interval=10 * 1000, limit=None, key="refresh")
-    show_kds_page()
\ No newline at end of file
+    show_kds_page()
+    query_log_panel()
\ No newline at end of file
@@ -1,10 +1,16 @@
 import streamlit as st
 import sqlite3
+import os
 import pandas as pd
 from datetime import datetime, date, timedelta
 from utils.util import format_price, format_timestamp
-from utils.database import  get_db_connection
+from utils.money import format_columns
+from utils.database import report_snapshot, report_copy_age, REPORT_COPY_MAX_AGE
+from utils.catalog import get_menu_catalog
+from utils.reports import get_transaction_page, count_transactions, get_sales_summary
+from utils.export import EXPORTERS, export_dir
 from utils.style import load_css 
+from utils.querylog import query_log_panel
 
 # Page configuration
 st.set_page_config(page_title="Daily Transactions", page_icon="📑", layout="wide")
@@ -12,82 +18,22 @@ st.title("📑 Daily Transactions")
 st.markdown("---")
 
 
-def get_transaction_data(start_date, end_date):
-    """Fetch transaction data for the selected date range"""
-    conn = get_db_connection()
-    if not conn:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            oh.order_id,
-            CASE oh.order_status
-                WHEN 1 THEN 'order created'
-                WHEN 2 THEN 'order confirmed'
-                WHEN 3 THEN 'order paid'
-                ELSE 'unknown'
-            END AS order_status,
-            oh.timestamp,
-            -- pi.product_id,
-            pi.description as product_description,
-            pi.price,
-            --pi.tax,
-            op.product_quantity,
-            -- op.service_area_id,
-            -- op.option,
-            (pi.price * op.product_quantity) as subtotal,
-            --(pi.tax * op.product_quantity) as total_tax,
-            --((pi.price + pi.tax) * op.product_quantity) as total_amount
-            ((pi.price ) * op.product_quantity) as total_amount
-        FROM Order_History oh
-        LEFT JOIN Order_Product op ON oh.order_id = op.order_id
-        LEFT JOIN Product pi ON op.product_id = pi.product_id
-        WHERE DATE(oh.timestamp) BETWEEN ? AND ?
-        ORDER BY oh.timestamp DESC, oh.order_id, pi.product_id
-        """
-        
-        df = pd.read_sql_query(query, conn, params=(start_date, end_date))
-        return df
-        
-    except sqlite3.Error as e:
-        st.error(f"Database query error: {e}")
-        return pd.DataFrame()
-    finally:
-        conn.close()
+def get_transaction_data(conn, start_date, end_date, page_size, after=None):
+    """Fetch one page of transaction data; returns (DataFrame, next page cursor)"""
+    df, next_cursor = get_transaction_page(conn, start_date, end_date, page_size, after)
+    # Descriptions come from the in-memory menu instead of a Product join
+    catalog = get_menu_catalog()
+    df.insert(3, 'product_description', df.pop('product_id').map(catalog.product_name))
+    return df, next_cursor
 
-def get_summary_data(start_date, end_date):
+def get_transaction_count(conn, start_date, end_date):
+    """Count transaction rows for the selected date range"""
+    return count_transactions(conn, start_date, end_date)
+
+def get_summary_data(conn, start_date, end_date):
     """Get summary statistics for the selected date range"""
-    conn = get_db_connection()
-    if not conn:
-        return {}
-    
-    try:
-        query = """
-        SELECT 
-            COUNT(DISTINCT oh.order_id) as total_orders,
-            COUNT(op.product_id) as total_items,
-            SUM(op.product_quantity) as total_quantity,
-            SUM((pi.price) * op.product_quantity) as total_revenue
-        FROM Order_History oh
-        LEFT JOIN Order_Product op ON oh.order_id = op.order_id
-        LEFT JOIN Product pi ON op.product_id = pi.product_id
-        WHERE DATE(oh.timestamp) BETWEEN ? AND ? AND oh.order_status IN (3)
-        """
-        
-        result = conn.execute(query, (start_date, end_date)).fetchone()
-        return {
-            'total_orders': result[0] or 0,
-            'total_items': result[1] or 0,
-            'total_quantity': result[2] or 0,
-            'total_revenue': result[3] or 0
-        }
-        
-    except sqlite3.Error as e:
-        st.error(f"Database query error: {e}")
-        return {}
-    finally:
-        conn.close()
+    # Daily_Sales holds one pre-aggregated row per day
+    return get_sales_summary(conn, start_date, end_date)
 
 # Sidebar for date selection
 st.sidebar.header(" Date Selection")
@@ -138,13 +84,38 @@ if start_date == end_date:
 else:
     st.sidebar.info(f"Selected: {start_date} to {end_date}")
 
+# Long ranges can read the report copy instead of the live database
+use_copy = st.sidebar.toggle("Read from report copy", key="report_copy",
+                             help=f"A copy of the database refreshed every {REPORT_COPY_MAX_AGE / 60:g} minutes")
+if use_copy:
+    copy_age = report_copy_age()
+    st.sidebar.caption("Copy made on first read" if copy_age is None
+                       else f"Copy is {copy_age / 60:.0f} min old")
+
 # Main content
 if st.sidebar.button("Refresh Data", type="primary"):
     st.cache_data.clear()
 
+# Keyset pagination: keep the cursor that starts each page visited so far
+items_per_page = st.session_state.get("items_per_page", 25)
+page_key = (start_date, end_date, items_per_page)
+if st.session_state.get('history_page_key') != page_key:
+    st.session_state.history_page_key = page_key
+    st.session_state.history_cursors = [None]
+cursors = st.session_state.history_cursors
+
+# Summary, count and page read one snapshot, so they always agree
+summary, total_rows, df, next_cursor = {}, 0, pd.DataFrame(), None
+try:
+    with report_snapshot(copy=use_copy) as conn:
+        summary = get_summary_data(conn, start_date, end_date)
+        total_rows = get_transaction_count(conn, start_date, end_date)
+        df, next_cursor = get_transaction_data(conn, start_date, end_date, items_per_page, cursors[-1])
+except (sqlite3.Error, OSError) as e:
+    st.error(f"Database query error: {e}")
+
 # Get and display summary statistics
 st.subheader(" Summary Statistics")
-summary = get_summary_data(start_date, end_date)
 
 if summary:
     col1, col2, col3, col4 = st.columns(4)
@@ -162,25 +133,18 @@ st.divider()
 
 # Get transaction data
 st.subheader(" Transaction Details")
-df = get_transaction_data(start_date, end_date)
+
+# Display options
+st.selectbox("Items per page", [10, 25, 50, 100], index=1, key="items_per_page")
 
 if df.empty:
     st.info("No transactions found for the selected date range.")
 else:
-    # Format the data for display
-    display_df = df.copy()
+    # Format only the rows on this page
+    display_df = df
     
-    # Format price columns
-    if 'price' in display_df.columns:
-        display_df['price'] = display_df['price'].apply(format_price)
-    if 'tax' in display_df.columns:
-        display_df['tax'] = display_df['tax'].apply(format_price)
-    if 'subtotal' in display_df.columns:
-        display_df['subtotal'] = display_df['subtotal'].apply(format_price)
-    if 'total_tax' in display_df.columns:
-        display_df['total_tax'] = display_df['total_tax'].apply(format_price)
-    if 'total_amount' in display_df.columns:
-        display_df['total_amount'] = display_df['total_amount'].apply(format_price)
+    # Format price columns, a whole column at a time
+    format_columns(display_df, ['price', 'tax', 'subtotal', 'total_tax', 'total_amount'])
     
     # Format timestamp
     if 'timestamp' in display_df.columns:
@@ -205,23 +169,6 @@ else:
     
     display_df = display_df.rename(columns=column_mapping)
     
-    # Display options
-    items_per_page = st.selectbox("Items per page", [10, 25, 50, 100], index=1)
-
-    # Show detailed view with pagination
-    total_rows = len(display_df)
-    
-    if total_rows > items_per_page:
-        page_num = st.number_input(
-            f"Page (showing {items_per_page} of {total_rows} records)",
-            min_value=1,
-            max_value=(total_rows - 1) // items_per_page + 1,
-            value=1
-        )
-        start_idx = (page_num - 1) * items_per_page
-        end_idx = start_idx + items_per_page
-        display_df = display_df.iloc[start_idx:end_idx]
-    
     # Display the data editor
     edited_df = st.data_editor(
         display_df,
@@ -246,6 +193,45 @@ else:
         }
     )
     
-    # Show record count
-    st.info(f"Showing {len(display_df)} of {total_rows} records")
+    # Page navigation
+    first_row = (len(cursors) - 1) * items_per_page + 1
+    col1, col2, col3 = st.columns([1, 4, 1])
+    with col1:
+        st.button("◀ Previous", disabled=len(cursors) == 1,
+                  on_click=cursors.pop, width='stretch')
+    with col2:
+        # Show record count
+        st.info(f"Showing {first_row}-{first_row + len(display_df) - 1} of {total_rows} records")
+    with col3:
+        st.button("Next ▶", disabled=next_cursor is None,
+                  on_click=cursors.append, args=(next_cursor,), width='stretch')
+
+
+# Export the selected range to a file, streamed in chunks
+st.sidebar.markdown("---")
+st.sidebar.header(" Export")
+export_format = st.sidebar.radio("File format:", ["csv", "parquet"], horizontal=True)
 
+if st.sidebar.button("Export Range", width='stretch'):
+    os.makedirs(export_dir(), exist_ok=True)
+    export_path = os.path.join(export_dir(), f"transactions_{start_date}_{end_date}.{export_format}")
+    progress_bar = st.sidebar.progress(0.0, text="Exporting...")
+
+    def show_progress(done, total):
+        progress_bar.progress(min(done / total, 1.0) if total else 1.0, text=f"{done:,} / {total:,} rows")
+
+    try:
+        rows_written = EXPORTERS[export_format](export_path, start_date, end_date,
+                                                       progress=show_progress, copy=use_copy)
+        progress_bar.progress(1.0, text=f"{rows_written:,} rows")
+        st.session_state.export_path = export_path
+    except (sqlite3.Error, OSError) as e:
+        st.sidebar.error(f"Export failed: {e}")
+
+export_path = st.session_state.get('export_path')
+if export_path and os.path.exists(export_path):
+    st.sidebar.success(f"Saved to {export_path}")
+    with open(export_path, "rb") as f:
+        st.sidebar.download_button("Download", f, file_name=os.path.basename(export_path), width='stretch')
+
+query_log_panel()
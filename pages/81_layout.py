@@ -1,39 +1,29 @@
 import streamlit as st
+import html
+import os
 import sqlite3
 import pandas as pd
+from utils.database import write
+from utils.floor import get_floor_state, save_layout
+from utils.floorplan import floor_plan_grid
 
-# --- DATABASE SETUP ---
-def init_db():
-    conn = sqlite3.connect('layout.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS Service_Area (
-        service_area_id INTEGER PRIMARY KEY AUTOINCREMENT, 
-        description TEXT,
-        table_type TEXT, 
-        capacity INTEGER, 
-        row_idx INTEGER, 
-        col_idx INTEGER,    
-        status INTEGER DEFAULT 0,
-        timestamp DATETIME DEFAULT (datetime('now', 'localtime'))
-    );''')
-    conn.commit()
-    conn.close()
+# --- FLOOR PLAN (Service_Area in the main database) ---
+def load_layout():
+    """The saved floor plan as the editor's {(row, col): {"type", "capacity"}}"""
+    return {cell: {"type": area.table_type, "capacity": area.capacity}
+            for cell, area in get_floor_state().placed().items()}
 
-def save_layout(layout_data):
-    conn = sqlite3.connect('layout.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM Service_Area") 
-    for item in layout_data:
-        c.execute("INSERT INTO Service_Area (table_type, capacity, row_idx, col_idx) VALUES (?, ?, ?, ?)", 
-                  (item['type'], item['capacity'], item['row'], item['col']))
-    conn.commit()
-    conn.close()
+# Layouts used to be saved to their own layout.db; it can be merged in once
+LEGACY_LAYOUT_DB = 'layout.db'
 
-def load_layout():
-    conn = sqlite3.connect('layout.db')
-    df = pd.read_sql_query("SELECT * FROM Service_Area", conn)
-    conn.close()
-    return df
+def read_legacy_layout(path=LEGACY_LAYOUT_DB):
+    """The cells saved in the old layout.db"""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT row_idx, col_idx, table_type, capacity FROM Service_Area").fetchall()
+    finally:
+        conn.close()
+    return {(r, c): {"type": table_type, "capacity": capacity} for r, c, table_type, capacity in rows}
 
 # --- UI STYLING FOR VISUAL LAYOUT ---
 def render_table_shape(table_type, capacity):
@@ -62,24 +52,43 @@ def render_table_shape(table_type, capacity):
     """
     return style
 
+def render_floor_plan(layout, grid_rows, grid_cols):
+    """The whole preview as one HTML grid, in one pass over the placed tables"""
+    cells = "".join(
+        f'<div style="grid-row: {r + 1}; grid-column: {c + 1};">'
+        f'{render_table_shape(table["type"], table["capacity"])}</div>'
+        for (r, c), table in layout.items() if r < grid_rows and c < grid_cols)
+    return (f'<div style="display: grid; grid-template-columns: repeat({grid_cols}, minmax(0, 1fr)); '
+            f'grid-template-rows: repeat({grid_rows}, 64px); gap: 4px; align-items: center;">{cells}</div>')
+
 # --- MAIN APP ---
 def main():
     st.set_page_config(page_title="Restaurant Layout Designer", layout="wide")
-    init_db()
+    saved_rows, saved_cols = get_floor_state().grid_size()
 
     st.title("🍽️ Restaurant Table Layout Designer")
     
     # Sidebar Configuration
     st.sidebar.header("Configuration")
-    grid_rows = st.sidebar.number_input("Grid Rows", min_value=1, max_value=20, value=6)
-    grid_cols = st.sidebar.number_input("Grid Columns", min_value=1, max_value=20, value=8)
+    grid_rows = st.sidebar.number_input("Grid Rows", min_value=1, max_value=20, value=max(6, saved_rows))
+    grid_cols = st.sidebar.number_input("Grid Columns", min_value=1, max_value=20, value=max(8, saved_cols))
     
     st.sidebar.subheader("Add Table")
     selected_type = st.sidebar.selectbox("Table Type", ["Square", "Circle", "Rectangular"])
     capacity = st.sidebar.number_input("Capacity", min_value=1, max_value=20, value=2)
     
     if 'layout' not in st.session_state:
-        st.session_state.layout = {}
+        st.session_state.layout = load_layout()
+
+    if os.path.exists(LEGACY_LAYOUT_DB) and not get_floor_state().placed():
+        if st.sidebar.button(f"Import {LEGACY_LAYOUT_DB}"):
+            try:
+                st.session_state.layout = read_legacy_layout()
+                write(save_layout, st.session_state.layout)
+                st.session_state.layout = load_layout()
+                st.rerun()
+            except sqlite3.Error as e:
+                st.sidebar.error(f"Error importing {LEGACY_LAYOUT_DB}: {e}")
 
     def toggle_table(r, c):
         if (r, c) in st.session_state.layout:
@@ -87,24 +96,17 @@ def main():
         else:
             st.session_state.layout[(r, c)] = {"type": selected_type, "capacity": capacity}
 
-    # Grid Editor Workspace
+    # Grid Editor Workspace: one component for the whole grid, clicks toggle before the rerun
     st.subheader("Edit Floor Plan")
     st.info("Click a cell to place the selected table type. Click an existing table to remove it.")
     
-    for r in range(grid_rows):
-        cols = st.columns(grid_cols)
-        for c in range(grid_cols):
-            with cols[c]:
-                table_data = st.session_state.layout.get((r, c))
-                if table_data:
-                    btn_label = f"{table_data['type']}\n({table_data['capacity']})"
-                    if st.button(btn_label, key=f"btn_{r}_{c}"):
-                        toggle_table(r, c)
-                        st.rerun()
-                else:
-                    if st.button("[ + ]", key=f"empty_{r}_{c}"):
-                        toggle_table(r, c)
-                        st.rerun()
+    floor_plan_grid(
+        grid_rows, grid_cols,
+        {cell: f"{html.escape(str(table['type']))}<br>({table['capacity']})"
+         for cell, table in st.session_state.layout.items()},
+        key="floor_plan_editor",
+        on_click=toggle_table,
+    )
 
     st.divider()
 
@@ -112,10 +114,19 @@ def main():
     col1, col2, col3 = st.columns([1, 1, 4])
     with col1:
         if st.button("💾 Save Layout", type="primary"):
-            data = [{"row": r, "col": c, "type": v['type'], "capacity": v['capacity']} 
-                    for (r, c), v in st.session_state.layout.items()]
-            save_layout(data)
-            st.success("Saved successfully!")
+            try:
+                # Only the cells that differ from Service_Area are written
+                counts, conflicts = write(save_layout, st.session_state.layout)
+                st.success("Saved successfully! " + ", ".join(f"{n} {change}" for change, n in counts.items() if n)
+                           if any(counts.values()) else "No changes to save.")
+                if conflicts:
+                    # Seated tables and tables with open orders keep their saved place and shape
+                    st.session_state.layout = load_layout()
+                    st.warning("Kept tables that are in use: " + ", ".join(
+                        f"{description} at row {r + 1}, column {c + 1}"
+                        for (r, c), description in sorted(conflicts.items())))
+            except sqlite3.Error as e:
+                st.error(f"Error saving layout: {e}")
     
     with col2:
         show_layout = st.toggle("👀 Show Layout Preview", value=False)
@@ -123,18 +134,10 @@ def main():
     # VISUAL LAYOUT PREVIEW PANEL
     if show_layout:
         st.subheader("Visual Layout Preview")
-        for r in range(grid_rows):
-            cols = st.columns(grid_cols)
-            for c in range(grid_cols):
-                with cols[c]:
-                    table_data = st.session_state.layout.get((r, c))
-                    if table_data:
-                        st.markdown(render_table_shape(table_data['type'], table_data['capacity']), unsafe_allow_html=True)
-                    else:
-                        st.write("") 
+        st.html(render_floor_plan(st.session_state.layout, grid_rows, grid_cols))
 
     if st.checkbox("Show Database Table"):
-        st.table(load_layout())
+        st.table(pd.DataFrame([area._asdict() for area in get_floor_state().placed().values()]))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,35 +2,14 @@ import streamlit as st
 import pandas as pd
 from utils.database import get_db_connection
 from utils.util import format_price
+from utils.money import split_items
+from utils.tax import get_tax_table
+from utils.catalog import get_menu_catalog, resolve_line_modifiers
+from utils.querylog import query_log_panel
 
 
 # ── Reuse data fetchers from 11_CFD.py ──────────────────────────────────────
 
-def get_modifiers_details(modifier_ids):
-    """Return a list of modifier dicts given a modifier id string/list."""
-    if not modifier_ids:
-        return []
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        if isinstance(modifier_ids, str):
-            ids = [m.strip() for m in modifier_ids.split(",") if m.strip()]
-        else:
-            ids = list(modifier_ids)
-        if not ids:
-            return []
-        placeholders = ",".join("?" * len(ids))
-        cursor.execute(
-            f"SELECT description, price FROM Modifier WHERE modifier_id IN ({placeholders})",
-            ids,
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        return [{"description": r[0], "price": r[1]} for r in rows]
-    except Exception:
-        return []
-
-
 def get_order_details():
     """Fetch the active order from Order_Cart / Order_Product (order_status = 10)."""
     try:
@@ -41,19 +20,21 @@ def get_order_details():
                 oc.order_id,
                 oc.subtotal,
                 op.product_id,
-                op.modifiers,
-                pi.description  AS product_description,
+                op.order_product_id,
                 op.product_quantity,
-                pi.price        AS product_price,
-                pi.tax          AS tax
+                op.unit_price   AS product_price,
+                op.tax_rate     AS tax
             FROM Order_Cart oc
             LEFT JOIN Order_Product op ON oc.order_id = op.order_id
-            LEFT JOIN Product pi       ON op.product_id = pi.product_id
             WHERE oc.order_status IN (3) 
-            ORDER BY oc.order_id, pi.description
+            ORDER BY oc.order_id, op.order_product_id
         """)
         columns = [col[0] for col in cursor.description]
+        # Descriptions come from the in-memory menu instead of a Product join
+        catalog = get_menu_catalog()
         rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            row["product_description"] = catalog.product_name(row["product_id"])
         conn.close()
         return rows
     except Exception:
@@ -65,11 +46,12 @@ def get_order_details():
 def build_order_items(order_data):
     """Convert raw order_data rows into a flat list of display-ready item dicts."""
     items = []
-    for row in order_data:
+    lines = []
+    # Modifiers for every line, resolved in one pass
+    line_modifiers = resolve_line_modifiers(order_data)
+    for row, (modifiers, modifier_total) in zip(order_data, line_modifiers):
         if not row.get("product_id"):
             continue
-        modifiers = get_modifiers_details(row.get("modifiers"))
-        modifier_total = sum(mod["price"] for mod in modifiers)
         unit_price = row["product_price"] + modifier_total
         quantity = row["product_quantity"]
         total_price = unit_price * quantity
@@ -88,6 +70,15 @@ def build_order_items(order_data):
             "Unit Price": unit_price,
             "Price": total_price,
         })
+        lines.append(row)
+
+    # Each item carries its own tax (utils/tax.py), so a payer pays the tax on what they had
+    taxes = get_tax_table().line_tax([item["Price"] for item in items],
+                                     [row["product_id"] for row in lines],
+                                     [row["tax"] for row in lines]).tolist()
+    for item, tax in zip(items, taxes):
+        item["Tax"] = tax
+        item["Total"] = item["Price"] + tax
     return items
 
 
@@ -117,7 +108,9 @@ df_order = pd.DataFrame([
         "Description": item["Description"],
         "Qty": item["Quantity"],
         "Unit Price": format_price(item["Unit Price"]),
-        "Total": format_price(item["Price"]),
+        "Price": format_price(item["Price"]),
+        "Tax": format_price(item["Tax"]),
+        "Total": format_price(item["Total"]),
     }
     for item in order_items
 ])
@@ -132,7 +125,7 @@ st.subheader("Assign Payers to Items")
 assignments = {}  # item_index -> list of payers
 
 for i, item in enumerate(order_items):
-    st.markdown(f"**{item['Description']}** — {format_price(item['Price'])}")
+    st.markdown(f"**{item['Description']}** — {format_price(item['Total'])}")
     selected = []
     cols = st.columns(len(payers))
     for j, payer in enumerate(payers):
@@ -142,14 +135,12 @@ for i, item in enumerate(order_items):
 
 # Calculate and display splits
 st.subheader("Bill Split Results")
-totals = {payer: 0.0 for payer in payers}
-
-for i, item in enumerate(order_items):
-    selected = assignments[i]
-    if selected:
-        share = item["Price"] / len(selected)
-        for payer in selected:
-            totals[payer] += share
+# Integer cents: each item (with its tax) is split evenly, extra cents to the first payers
+amounts = split_items(
+    [item["Total"] for item in order_items],
+    [[payer in assignments[i] for payer in payers] for i in range(len(order_items))],
+)
+totals = dict(zip(payers, amounts.tolist()))
 
 df_results = pd.DataFrame(
     [{"Payer": payer, "Amount Owed": format_price(amount)} for payer, amount in totals.items()]
@@ -158,12 +149,12 @@ st.table(df_results)
 
 # Grand total check
 assigned_total = sum(
-    order_items[i]["Price"]
+    order_items[i]["Total"]
     for i, selected in assignments.items()
     if selected
 )
 unassigned_total = sum(
-    order_items[i]["Price"]
+    order_items[i]["Total"]
     for i, selected in assignments.items()
     if not selected
 )
@@ -171,4 +162,6 @@ unassigned_total = sum(
 if unassigned_total > 0:
     st.warning(f"⚠️ {format_price(unassigned_total)} worth of items have not been assigned to any payer.")
 
-st.markdown(f"**Total assigned: {format_price(assigned_total)}**")
\ No newline at end of file
+st.markdown(f"**Total assigned: {format_price(assigned_total)}**")
+
+query_log_panel()
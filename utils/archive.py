@@ -0,0 +1,210 @@
+import argparse
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+
+from utils.database import (open_connection, set_db_path, get_db_path, table_columns,
+                            suspended_triggers, ORDER_PAID, ORDER_VOIDED)
+
+# ── Order history archive ────────────────────────────────────────────────────
+# Settled orders (paid or voided) whose last Order_History row falls in a
+# closed month are moved, with their lines, modifiers and history, into one
+# SQLite file per month under archive/ next to the database. Archive_Catalog
+# in the live database records each file and the history timestamps it holds,
+# so reports open only the months a date range reaches into.
+
+# Tables that move with an order, all keyed by order_id (parents first)
+ARCHIVE_TABLES = ("Order_Cart", "Order_Product", "Order_Product_Modifier", "Order_History")
+
+ARCHIVE_INDEXES = """
+CREATE INDEX IF NOT EXISTS archive.idx_order_history_timestamp ON Order_History(timestamp);
+CREATE INDEX IF NOT EXISTS archive.idx_order_history_order_id ON Order_History(order_id);
+CREATE INDEX IF NOT EXISTS archive.idx_order_product_order_id ON Order_Product(order_id);
+CREATE INDEX IF NOT EXISTS archive.idx_order_product_modifier_order
+ON Order_Product_Modifier(order_id, order_product_id, modifier_id, price);
+"""
+
+# How many recent months stay in the live database (1 = the current month)
+KEEP_MONTHS = 1
+
+
+def archive_dir():
+    return os.path.join(os.path.dirname(get_db_path()), "archive")
+
+def archive_file_name(month):
+    stem = os.path.splitext(os.path.basename(get_db_path()))[0]
+    return f"{stem}-{month}.database"
+
+def month_start(day, months_back=0):
+    """First day of the month months_back months before day's month."""
+    months = day.year * 12 + day.month - 1 - months_back
+    return date(months // 12, months % 12 + 1, 1)
+
+# Reading across archives
+
+def open_archive(path):
+    """Read-only connection to one archive file."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, detect_types=sqlite3.PARSE_DECLTYPES,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def history_sources(conn, start, end):
+    """
+    Yield a connection for every database holding Order_History rows with
+    start <= timestamp < end: conn itself (the live database) first, then
+    each archive file that overlaps, newest first, opened read-only on its
+    own connection. Archives are not ATTACHed, so this works inside a
+    report snapshot; each archive connection is closed when the next source
+    is requested, so finish reading one source before moving on.
+    """
+    yield conn
+    files = [row[0] for row in conn.execute("""
+        SELECT file_name FROM Archive_Catalog
+        WHERE min_timestamp < ? AND max_timestamp >= ?
+        ORDER BY month DESC
+    """, (end, start))]
+    for file_name in files:
+        path = os.path.join(archive_dir(), file_name)
+        if os.path.exists(path):
+            archive = open_archive(path)
+            try:
+                yield archive
+            finally:
+                archive.close()
+
+# Moving orders out
+
+@contextmanager
+def attached_archive(conn, path):
+    """ATTACH an archive file as `archive` for the duration of the block."""
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        yield "archive."
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+def archivable_orders(conn, cutoff):
+    """Settled orders whose last history row is before cutoff, as {"YYYY-MM": [order_id, ...]}."""
+    rows = conn.execute(f"""
+        SELECT strftime('%Y-%m', last_timestamp) AS month, order_id
+        FROM (
+            SELECT oc.order_id,
+                   (SELECT MAX(oh.timestamp) FROM Order_History oh WHERE oh.order_id = oc.order_id) AS last_timestamp
+            FROM Order_Cart oc
+            WHERE oc.order_status IN ({ORDER_PAID}, {ORDER_VOIDED})
+        )
+        WHERE last_timestamp < ?
+        ORDER BY month, order_id
+    """, (cutoff.isoformat(),)).fetchall()
+    by_month = {}
+    for month, order_id in rows:
+        by_month.setdefault(month, []).append(order_id)
+    return by_month
+
+def _ensure_archive_schema(conn):
+    """Create the archived tables in `archive` like the live ones, adding columns added since."""
+    for table in ARCHIVE_TABLES:
+        sql = conn.execute(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        conn.execute(re.sub(r'^CREATE TABLE\s+"?\w+"?', f"CREATE TABLE IF NOT EXISTS archive.{table}", sql))
+        archived = {row[1] for row in conn.execute(f"PRAGMA archive.table_info({table})")}
+        for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+            if row[1] not in archived:
+                conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {row[1]} {row[2]}")
+    conn.executescript(ARCHIVE_INDEXES)
+
+def archive_month(conn, month, order_ids):
+    """
+    Move order_ids into the archive file for month and record it in
+    Archive_Catalog. Copies are replaced before rows are deleted, so
+    re-running after an interruption is safe.
+    """
+    os.makedirs(archive_dir(), exist_ok=True)
+    file_name = archive_file_name(month)
+    with attached_archive(conn, os.path.join(archive_dir(), file_name)):
+        _ensure_archive_schema(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_orders (order_id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM temp.archive_orders")
+            conn.executemany("INSERT INTO temp.archive_orders (order_id) VALUES (?)",
+                             [(order_id,) for order_id in order_ids])
+            selected = "order_id IN (SELECT order_id FROM temp.archive_orders)"
+
+            for table in ARCHIVE_TABLES:
+                columns = ", ".join(sorted(table_columns(conn, table)))
+                conn.execute(f"DELETE FROM archive.{table} WHERE {selected}")
+                conn.execute(f"INSERT INTO archive.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE {selected}")
+            # Moving history is not an order change: no events, totals or history rows
+            with suspended_triggers(conn, *ARCHIVE_TABLES):
+                for table in reversed(ARCHIVE_TABLES):
+                    conn.execute(f"DELETE FROM main.{table} WHERE {selected}")
+            conn.execute(f"DELETE FROM main.Order_Event WHERE {selected}")
+
+            conn.execute("""
+                INSERT INTO main.Archive_Catalog (month, file_name, min_timestamp, max_timestamp, orders, history_rows)
+                SELECT ?, ?, MIN(timestamp), MAX(timestamp), COUNT(DISTINCT order_id), COUNT(*)
+                FROM archive.Order_History
+                WHERE true
+                ON CONFLICT (month) DO UPDATE SET
+                    file_name = excluded.file_name,
+                    min_timestamp = excluded.min_timestamp,
+                    max_timestamp = excluded.max_timestamp,
+                    orders = excluded.orders,
+                    history_rows = excluded.history_rows,
+                    archived_at = CURRENT_TIMESTAMP
+            """, (month, file_name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def archive_closed_months(keep_months=KEEP_MONTHS, today=None, progress=None):
+    """
+    Archive every settled order older than the last keep_months months.
+    progress(month, orders) is called after each month.
+    Returns: {"YYYY-MM": orders archived}
+    """
+    cutoff = month_start(today or date.today(), keep_months - 1)
+    conn = open_connection()
+    try:
+        archived = {}
+        for month, order_ids in archivable_orders(conn, cutoff).items():
+            archive_month(conn, month, order_ids)
+            archived[month] = len(order_ids)
+            if progress:
+                progress(month, len(order_ids))
+        if archived:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return archived
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.archive",
+        description="Move settled orders of closed months into per-month archive databases.")
+    parser.add_argument("--keep-months", type=int, default=KEEP_MONTHS,
+                        help="recent months kept in the live database (default: 1, the current month)")
+    parser.add_argument("--db", help="database file (default: POS_DB_PATH or the app database)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the live database afterwards")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        set_db_path(args.db)
+
+    archived = archive_closed_months(
+        args.keep_months, progress=lambda month, orders: print(f"{month}: {orders:,} orders archived"))
+    if not archived:
+        print("Nothing to archive")
+    elif args.vacuum:
+        conn = open_connection()
+        conn.execute("VACUUM")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
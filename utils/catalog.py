@@ -0,0 +1,163 @@
+import threading
+from collections import namedtuple
+from utils.database import open_connection, get_db_path, get_db_connection
+
+# Compact, read-only records for the in-memory menu
+Category = namedtuple("Category", "category_id description")
+Product = namedtuple("Product", "product_id description category_id price tax status")
+ModifierGroup = namedtuple("ModifierGroup", "modifier_group_id description")
+Modifier = namedtuple("Modifier", "modifier_id description product_id modifier_group_id price status")
+
+
+class MenuCatalog:
+    """Process-wide copy of Category, Product, Modifier and Modifier_Group.
+
+    The menu is loaded with one bulk query per table and indexed by category
+    and by product. refresh() is cheap: `PRAGMA data_version` tells whether
+    anything was committed since the last check, and only then is the
+    Catalog_Version counter (bumped by triggers on the menu tables) read.
+    The menu is reloaded only when that counter moves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self._db_path = None
+        self._data_version = None
+        self.version = None
+        self.loads = 0
+        self.categories = ()
+        self.products = {}
+        self.products_by_category = {}
+        self.modifier_groups = {}
+        self.modifiers = {}
+        self.modifiers_by_product = {}
+
+    def _load(self, conn):
+        categories = tuple(Category(*row) for row in conn.execute(
+            "SELECT category_id, description FROM Category ORDER BY category_id"))
+        products = [Product(*row) for row in conn.execute(
+            "SELECT product_id, description, category_id, price, tax, status FROM Product ORDER BY product_id")]
+        groups = {row[0]: ModifierGroup(*row) for row in conn.execute(
+            "SELECT modifier_group_id, description FROM Modifier_Group")}
+        modifiers = [Modifier(*row) for row in conn.execute(
+            "SELECT modifier_id, description, product_id, modifier_group_id, price, status FROM Modifier ORDER BY modifier_id")]
+
+        by_category = {}
+        for product in products:
+            by_category.setdefault(product.category_id, []).append(product)
+        by_product = {}
+        for modifier in modifiers:
+            by_product.setdefault(modifier.product_id, []).append(modifier)
+
+        self.categories = categories
+        self.products = {p.product_id: p for p in products}
+        self.products_by_category = {k: tuple(v) for k, v in by_category.items()}
+        self.modifier_groups = groups
+        self.modifiers = {m.modifier_id: m for m in modifiers}
+        self.modifiers_by_product = {k: tuple(v) for k, v in by_product.items()}
+        self.loads += 1
+
+    def refresh(self):
+        """Reload the menu if it changed; returns True when a reload happened."""
+        with self._lock:
+            if self._db_path != get_db_path():
+                if self._conn is not None:
+                    self._conn.close()
+                self._conn = open_connection()
+                self._db_path = get_db_path()
+                self.version = None
+            conn = self._conn
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if self.version is not None and data_version == self._data_version:
+                return False
+            self._data_version = data_version
+
+            conn.execute("BEGIN")
+            try:
+                version = conn.execute(
+                    "SELECT version FROM Catalog_Version WHERE catalog_version_id = 1").fetchone()[0]
+                if version == self.version:
+                    return False
+                self._load(conn)
+                self.version = version
+                return True
+            finally:
+                conn.execute("COMMIT")
+
+    def invalidate(self):
+        """Force a reload on the next refresh()."""
+        with self._lock:
+            self.version = None
+
+    # Lookups
+    def get_products(self, category_id):
+        return self.products_by_category.get(category_id, ())
+
+    def get_modifiers(self, product_id):
+        return self.modifiers_by_product.get(product_id, ())
+
+    def product_name(self, product_id):
+        product = self.products.get(product_id)
+        return product.description if product else None
+
+
+_catalog = MenuCatalog()
+
+def get_menu_catalog():
+    """Return the shared menu catalog, reloaded only if the menu changed."""
+    _catalog.refresh()
+    return _catalog
+
+# ── Order line modifiers ─────────────────────────────────────────────────────
+
+def get_order_line_modifiers(order_ids):
+    """
+    All modifiers of the given orders, read with one query that the
+    idx_order_product_modifier_order index covers. Prices are the ones
+    stored when the line was ordered; descriptions come from the catalog.
+    Returns: {order_product_id: [{"modifier_id", "description", "price"}, ...]}
+    """
+    order_ids = sorted({order_id for order_id in order_ids if order_id is not None})
+    if not order_ids:
+        return {}
+    conn = get_db_connection()
+    placeholders = ",".join("?" * len(order_ids))
+    rows = conn.execute(f"""
+        SELECT order_product_id, modifier_id, price
+        FROM Order_Product_Modifier
+        WHERE order_id IN ({placeholders})
+        ORDER BY order_id, order_product_id
+    """, order_ids).fetchall()
+
+    catalog = get_menu_catalog()
+    known = catalog.modifiers
+    missing = {row["modifier_id"] for row in rows if row["modifier_id"] not in known}
+    descriptions = {}
+    if missing:
+        placeholders = ",".join("?" * len(missing))
+        descriptions = dict(conn.execute(
+            f"SELECT modifier_id, description FROM Modifier WHERE modifier_id IN ({placeholders})",
+            list(missing)).fetchall())
+
+    by_line = {}
+    for row in rows:
+        modifier_id = row["modifier_id"]
+        description = known[modifier_id].description if modifier_id in known else descriptions.get(modifier_id, "")
+        by_line.setdefault(row["order_product_id"], []).append(
+            {"modifier_id": modifier_id, "description": description, "price": row["price"]})
+    return by_line
+
+def resolve_line_modifiers(order_lines):
+    """
+    Resolve the modifiers of every order line in one pass.
+    order_lines need order_id and order_product_id.
+    Returns: list aligned with order_lines of (modifiers, modifier_total),
+    where modifiers is a list of {"modifier_id", "description", "price"} dicts.
+    """
+    by_line = get_order_line_modifiers(line.get("order_id") for line in order_lines)
+    resolved = []
+    for line in order_lines:
+        modifiers = by_line.get(line.get("order_product_id"), [])
+        resolved.append((modifiers, sum(m["price"] for m in modifiers)))
+    return resolved
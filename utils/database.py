@@ -2,7 +2,15 @@ import sqlite3
 import streamlit as st
 import pandas as pd
 from datetime import date, datetime
+from collections import deque
+from contextlib import contextmanager
 import os
+import threading
+import weakref
+
+from utils import querylog
+from utils.money import DEFAULT_TAX_RATE, RATE_SCALE
+from utils.writer import WriteQueue
 
 # Adapter: Python date → ISO 8601 string
 def adapt_date_iso(val):
@@ -16,18 +24,730 @@ def convert_date(val):
 sqlite3.register_adapter(date, adapt_date_iso)
 sqlite3.register_converter("date", convert_date)
 
-# Connect with type detection enabled
-# def get_db_connection():
-#     conn = sqlite3.connect('~/.local/share/pos/pos.database', detect_types=sqlite3.PARSE_DECLTYPES)
-#     conn.row_factory = sqlite3.Row
-#     conn.execute('PRAGMA journal_mode=WAL;')
-#     return conn
+# Database location (POS_DB_PATH overrides it, e.g. for benchmarks)
+DB_PATH = os.environ.get("POS_DB_PATH", os.path.expanduser("~/.local/share/pos/pos.database"))
+
+# Applied once, when the pool opens a connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA cache_size=-16000;",      # 16 MB page cache
+    "PRAGMA mmap_size=268435456;",    # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA busy_timeout=5000;",
+)
+
+# Reporting connections: read-only, with a bigger cache and memory map for long scans.
+# query_only is switched on after the schema check (see ConnectionPool).
+REPORT_PRAGMAS = (
+    "PRAGMA cache_size=-65536;",      # 64 MB page cache
+    "PRAGMA mmap_size=1073741824;",   # 1 GB memory-mapped reads
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA busy_timeout=5000;",
+)
+
+# Seconds before report_snapshot(copy=True) refreshes the report copy
+REPORT_COPY_MAX_AGE = float(os.environ.get("POS_REPORT_COPY_MAX_AGE", 15 * 60))
+
+# Order_Cart.order_status values
+ORDER_CREATED = 1
+ORDER_CONFIRMED = 2
+ORDER_PAID = 3
+ORDER_VOIDED = 4
+
+# ── Schema upgrades ──────────────────────────────────────────────────────────
+# Idempotent DDL applied once per database file, so databases created from an
+# older `script` pick up new tables, columns and triggers. Keep in sync with `script`.
+
+SCHEMA_COLUMNS = (
+    # (table, column, declaration)
+    ("Modifier", "modifier_group_id", "INTEGER DEFAULT 0"),
+    # Price and tax snapshot taken when the line is ordered
+    ("Order_Product", "unit_price", "INTEGER"),
+    ("Order_Product", "modifier_total", "INTEGER DEFAULT 0"),
+    ("Order_Product", "tax_rate", "REAL"),
+    # Order totals kept current by the update_order_totals_* triggers
+    ("Order_Cart", "modifier_total", "INTEGER DEFAULT 0"),
+    ("Order_Cart", "tax", "INTEGER DEFAULT 0"),
+    # Session that seated the table (utils/floor.py claim_area)
+    ("Service_Area", "claim_token", "TEXT"),
+    # Floor plan position and table shape (pages/81_layout.py)
+    ("Service_Area", "table_type", "TEXT"),
+    ("Service_Area", "capacity", "INTEGER"),
+    ("Service_Area", "row_idx", "INTEGER"),
+    ("Service_Area", "col_idx", "INTEGER"),
+)
+
+def _line_tax_sql(amount, rate):
+    """
+    Tax in cents of amount at rate (percent, NULL for the default) as
+    money.line_tax_units computes it: integer milli-percent, rounded half
+    away from zero in integer arithmetic, so SQL and the tax engine agree.
+    """
+    product = f"({amount}) * CAST(ROUND(COALESCE({rate}, {DEFAULT_TAX_RATE}) * {RATE_SCALE}) AS INTEGER)"
+    denominator = 100 * RATE_SCALE
+    return f"(CASE WHEN {product} < 0 THEN -1 ELSE 1 END) * ((ABS({product}) * 2 + {denominator}) / {2 * denominator})"
+
+def _line_totals_sql(row, sign):
+    """SET clause adding (sign '+') or removing (sign '-') one order line's amounts."""
+    amount = f"(COALESCE({row}.unit_price, 0) + COALESCE({row}.modifier_total, 0)) * {row}.product_quantity"
+    return f"""
+        subtotal = COALESCE(subtotal, 0) {sign} COALESCE({row}.unit_price, 0) * {row}.product_quantity,
+        modifier_total = COALESCE(modifier_total, 0) {sign} COALESCE({row}.modifier_total, 0) * {row}.product_quantity,
+        tax = COALESCE(tax, 0) {sign} {_line_tax_sql(amount, f"{row}.tax_rate")}"""
+
+def _order_total_sql(row):
+    return f"""
+    UPDATE Order_Cart SET total = subtotal + modifier_total + tax + COALESCE(tip, 0)
+    WHERE order_id = {row}.order_id;"""
+
+# Order_Cart.subtotal/modifier_total/tax/total follow every line insert, update and delete,
+# inside the writer's transaction
+ORDER_TOTALS_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS update_order_totals_insert
+AFTER INSERT ON Order_Product
+BEGIN
+    UPDATE Order_Cart SET{_line_totals_sql("NEW", "+")}
+    WHERE order_id = NEW.order_id;{_order_total_sql("NEW")}
+END;
+CREATE TRIGGER IF NOT EXISTS update_order_totals_update
+AFTER UPDATE OF order_id, product_quantity, unit_price, modifier_total, tax_rate ON Order_Product
+BEGIN
+    UPDATE Order_Cart SET{_line_totals_sql("OLD", "-")}
+    WHERE order_id = OLD.order_id;
+    UPDATE Order_Cart SET{_line_totals_sql("NEW", "+")}
+    WHERE order_id = NEW.order_id;{_order_total_sql("OLD")}{_order_total_sql("NEW")}
+END;
+CREATE TRIGGER IF NOT EXISTS update_order_totals_delete
+AFTER DELETE ON Order_Product
+BEGIN
+    UPDATE Order_Cart SET{_line_totals_sql("OLD", "-")}
+    WHERE order_id = OLD.order_id;{_order_total_sql("OLD")}
+END;
+"""
+
+SCHEMA_UPGRADES = """
+CREATE TABLE IF NOT EXISTS Modifier_Group (
+    modifier_group_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    description TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS Catalog_Version (
+    catalog_version_id INTEGER PRIMARY KEY CHECK (catalog_version_id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO Catalog_Version (catalog_version_id, version) VALUES (1, 0);
+CREATE TABLE IF NOT EXISTS Floor_Version (
+    floor_version_id INTEGER PRIMARY KEY CHECK (floor_version_id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO Floor_Version (floor_version_id, version) VALUES (1, 0);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_service_area_cell
+ON Service_Area(row_idx, col_idx) WHERE row_idx IS NOT NULL;
+CREATE TABLE IF NOT EXISTS Order_Product_Modifier (
+    order_product_id INTEGER NOT NULL,
+    order_id INTEGER NOT NULL,
+    modifier_id INTEGER NOT NULL,
+    price INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (order_product_id) REFERENCES Order_Product(order_product_id),
+    FOREIGN KEY (order_id) REFERENCES Order_Cart(order_id),
+    FOREIGN KEY (modifier_id) REFERENCES Modifier(modifier_id)
+);
+CREATE INDEX IF NOT EXISTS idx_order_product_modifier_order
+ON Order_Product_Modifier(order_id, order_product_id, modifier_id, price);
+CREATE INDEX IF NOT EXISTS idx_order_product_modifier_line
+ON Order_Product_Modifier(order_product_id);
+CREATE TABLE IF NOT EXISTS Order_Event (
+    event_seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    order_status INTEGER,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_order_event_order_id
+ON Order_Event(order_id, event_seq);
+CREATE TRIGGER IF NOT EXISTS log_order_event_created
+AFTER INSERT ON Order_Cart
+BEGIN
+    INSERT INTO Order_Event (order_id, event_type, order_status)
+    VALUES (NEW.order_id, 'created', NEW.order_status);
+END;
+CREATE TRIGGER IF NOT EXISTS log_order_event_status
+AFTER UPDATE OF order_status ON Order_Cart
+WHEN NEW.order_status IS NOT OLD.order_status
+BEGIN
+    INSERT INTO Order_Event (order_id, event_type, order_status)
+    VALUES (NEW.order_id,
+            CASE NEW.order_status
+                WHEN 2 THEN 'confirmed'
+                WHEN 3 THEN 'paid'
+                WHEN 4 THEN 'voided'
+                ELSE 'status_changed'
+            END,
+            NEW.order_status);
+END;
+CREATE TRIGGER IF NOT EXISTS log_order_event_item_added
+AFTER INSERT ON Order_Product
+BEGIN
+    INSERT INTO Order_Event (order_id, event_type) VALUES (NEW.order_id, 'item_added');
+END;
+CREATE TRIGGER IF NOT EXISTS log_order_event_item_changed
+AFTER UPDATE ON Order_Product
+BEGIN
+    INSERT INTO Order_Event (order_id, event_type) VALUES (NEW.order_id, 'item_changed');
+END;
+CREATE TRIGGER IF NOT EXISTS log_order_event_item_removed
+AFTER DELETE ON Order_Product
+BEGIN
+    INSERT INTO Order_Event (order_id, event_type) VALUES (OLD.order_id, 'item_removed');
+END;
+CREATE TABLE IF NOT EXISTS Daily_Sales (
+    sales_date TEXT PRIMARY KEY, -- DATE(Order_History.timestamp) of the paid row
+    orders INTEGER NOT NULL DEFAULT 0,
+    items INTEGER NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS Archive_Catalog (
+    month TEXT PRIMARY KEY, -- YYYY-MM
+    file_name TEXT NOT NULL, -- in the archive/ directory next to the database
+    min_timestamp DATETIME, -- Order_History range held by the file
+    max_timestamp DATETIME,
+    orders INTEGER DEFAULT 0,
+    history_rows INTEGER DEFAULT 0,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TRIGGER IF NOT EXISTS update_daily_sales
+AFTER INSERT ON Order_History
+WHEN NEW.order_status = 3 AND NOT EXISTS (
+    SELECT 1 FROM Order_History
+    WHERE order_id = NEW.order_id AND order_status = 3 AND rowid < NEW.rowid)
+BEGIN
+    INSERT INTO Daily_Sales (sales_date, orders, items, quantity, revenue)
+    SELECT DATE(NEW.timestamp), 1, COUNT(op.product_id), COALESCE(SUM(op.product_quantity), 0),
+           COALESCE(SUM((COALESCE(op.unit_price, 0) + COALESCE(op.modifier_total, 0)) * op.product_quantity), 0)
+    FROM Order_Product op WHERE op.order_id = NEW.order_id
+    ON CONFLICT (sales_date) DO UPDATE SET
+        orders = orders + excluded.orders,
+        items = items + excluded.items,
+        quantity = quantity + excluded.quantity,
+        revenue = revenue + excluded.revenue;
+END;
+""" + ORDER_TOTALS_TRIGGERS + "".join(f"""
+CREATE TRIGGER IF NOT EXISTS bump_catalog_version_{table.lower()}_{event.lower()}
+AFTER {event} ON {table}
+BEGIN
+    UPDATE Catalog_Version SET version = version + 1 WHERE catalog_version_id = 1;
+END;""" for table in ("Category", "Product", "Modifier", "Modifier_Group")
+        for event in ("INSERT", "UPDATE", "DELETE")) + "".join(f"""
+CREATE TRIGGER IF NOT EXISTS bump_floor_version_{event.lower()}
+AFTER {event} ON Service_Area
+BEGIN
+    UPDATE Floor_Version SET version = version + 1 WHERE floor_version_id = 1;
+END;""" for event in ("INSERT", "UPDATE", "DELETE"))
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+def table_columns(conn, table_name):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+
+def _add_order_product_id(conn):
+    """Rebuild Order_Product with an explicit order_product_id key (stable across VACUUM)."""
+    sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'Order_Product'").fetchone()[0]
+    columns = ", ".join(row[1] for row in conn.execute("PRAGMA table_info(Order_Product)"))
+    new_sql = sql.replace("Order_Product", "Order_Product_New", 1).replace(
+        "(", "(\n    order_product_id INTEGER PRIMARY KEY AUTOINCREMENT,", 1)
+    conn.execute("PRAGMA legacy_alter_table=ON")
+    conn.executescript(f"""
+        BEGIN;
+        {new_sql};
+        INSERT INTO Order_Product_New (order_product_id, {columns}) SELECT rowid, {columns} FROM Order_Product;
+        DROP TABLE Order_Product;
+        ALTER TABLE Order_Product_New RENAME TO Order_Product;
+        CREATE INDEX IF NOT EXISTS idx_order_product_order_id ON Order_Product(order_id);
+        COMMIT;
+    """)
+    conn.execute("PRAGMA legacy_alter_table=OFF")
+
+def _backfill_line_modifiers(conn):
+    """Copy legacy comma-separated Order_Product.modifiers into Order_Product_Modifier."""
+    conn.execute("""
+        INSERT INTO Order_Product_Modifier (order_product_id, order_id, modifier_id, price)
+        SELECT op.order_product_id, op.order_id, m.modifier_id, m.price
+        FROM Order_Product op
+        JOIN json_each('[' || op.modifiers || ']') ids
+        JOIN Modifier m ON m.modifier_id = ids.value
+        WHERE op.modifiers IS NOT NULL AND TRIM(op.modifiers) != ''
+    """)
+
+def _backfill_line_snapshots(conn):
+    """Fill the price/tax snapshot of existing order lines from the current menu."""
+    conn.execute(f"""
+        UPDATE Order_Product SET
+            unit_price = (SELECT price FROM Product WHERE Product.product_id = Order_Product.product_id),
+            tax_rate = COALESCE((SELECT tax FROM Product WHERE Product.product_id = Order_Product.product_id),
+                                {DEFAULT_TAX_RATE}),
+            modifier_total = (SELECT COALESCE(SUM(price), 0) FROM Order_Product_Modifier opm
+                              WHERE opm.order_product_id = Order_Product.order_product_id)
+        WHERE unit_price IS NULL
+    """)
+
+def _backfill_order_totals(conn):
+    """Compute the stored totals of existing orders from their lines."""
+    amount = "(COALESCE(unit_price, 0) + COALESCE(modifier_total, 0)) * product_quantity"
+    conn.execute(f"""
+        UPDATE Order_Cart SET
+            subtotal = (SELECT COALESCE(SUM(COALESCE(unit_price, 0) * product_quantity), 0)
+                        FROM Order_Product op WHERE op.order_id = Order_Cart.order_id),
+            modifier_total = (SELECT COALESCE(SUM(COALESCE(modifier_total, 0) * product_quantity), 0)
+                              FROM Order_Product op WHERE op.order_id = Order_Cart.order_id),
+            tax = (SELECT COALESCE(SUM({_line_tax_sql(amount, "tax_rate")}), 0)
+                   FROM Order_Product op WHERE op.order_id = Order_Cart.order_id)
+    """)
+    # Settled orders keep the total that was charged
+    conn.execute(f"""
+        UPDATE Order_Cart SET total = subtotal + modifier_total + tax + COALESCE(tip, 0)
+        WHERE order_status != {ORDER_PAID}
+    """)
+
+def _upgrade_order_totals(conn):
+    """
+    For databases whose totals triggers still round tax in floating point
+    (and taxed lines without a rate at 0): give those lines DEFAULT_TAX_RATE,
+    as the tax engine charges them, recreate the triggers and recompute the
+    stored order totals.
+    """
+    for trigger in ("update_order_totals_insert", "update_order_totals_update",
+                    "update_order_totals_delete", "log_order_event_item_changed"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("UPDATE Order_Product SET tax_rate = ? WHERE tax_rate IS NULL", (DEFAULT_TAX_RATE,))
+    _backfill_order_totals(conn)
+    conn.commit()
+    conn.executescript(SCHEMA_UPGRADES)
+
+@contextmanager
+def suspended_triggers(conn, *tables):
+    """
+    Drop the triggers on tables for the duration of the block and recreate
+    them afterwards (bulk moves and loads). Use inside a transaction so
+    other connections never see the tables without their triggers.
+    """
+    placeholders = ",".join("?" * len(tables))
+    triggers = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({placeholders})",
+        tables).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        for _, sql in triggers:
+            conn.execute(sql)
+
+def rebuild_daily_sales(conn):
+    """Recompute Daily_Sales from Order_History (first paid row of each order)."""
+    conn.execute("DELETE FROM Daily_Sales")
+    conn.execute(f"""
+        WITH paid AS (
+            SELECT oh.order_id, DATE(oh.timestamp) AS sales_date
+            FROM Order_History oh
+            WHERE oh.order_status = {ORDER_PAID} AND NOT EXISTS (
+                SELECT 1 FROM Order_History p
+                WHERE p.order_id = oh.order_id AND p.order_status = {ORDER_PAID} AND p.rowid < oh.rowid)
+        )
+        INSERT INTO Daily_Sales (sales_date, orders, items, quantity, revenue)
+        SELECT paid.sales_date, COUNT(DISTINCT paid.order_id), COUNT(op.product_id),
+               COALESCE(SUM(op.product_quantity), 0),
+               COALESCE(SUM((COALESCE(op.unit_price, 0) + COALESCE(op.modifier_total, 0)) * op.product_quantity), 0)
+        FROM paid
+        LEFT JOIN Order_Product op ON op.order_id = paid.order_id
+        WHERE paid.sales_date IS NOT NULL
+        GROUP BY paid.sales_date
+    """)
+
+def _limit_history_to_status_changes(conn):
+    """Make log_order_update fire on order_status changes only, not on totals upkeep."""
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'log_order_update'").fetchone()
+    if row and "AFTER UPDATE ON Order_Cart" in row[0]:
+        conn.execute("DROP TRIGGER log_order_update")
+        conn.execute(row[0].replace("AFTER UPDATE ON Order_Cart", "AFTER UPDATE OF order_status ON Order_Cart"))
+        conn.commit()
+
+def ensure_schema(conn, db_path):
+    """Apply SCHEMA_COLUMNS and SCHEMA_UPGRADES once per database file."""
+    with _schema_lock:
+        if db_path in _schema_ready:
+            return
+        added_columns = set()
+        for table_name, column, declaration in SCHEMA_COLUMNS:
+            columns = table_columns(conn, table_name)
+            if columns and column not in columns:
+                conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {declaration}")
+                added_columns.add((table_name, column))
+        conn.commit()
+        _limit_history_to_status_changes(conn)
+
+        order_product_columns = table_columns(conn, "Order_Product")
+        if order_product_columns and "order_product_id" not in order_product_columns:
+            _add_order_product_id(conn)
+        # The old free-text Order_Product_Modifier was never written; replace it
+        line_modifier_columns = table_columns(conn, "Order_Product_Modifier")
+        if "modifier" in line_modifier_columns:
+            if conn.execute("SELECT 1 FROM Order_Product_Modifier LIMIT 1").fetchone():
+                conn.execute("ALTER TABLE Order_Product_Modifier RENAME TO Order_Product_Modifier_Legacy")
+            else:
+                conn.execute("DROP TABLE Order_Product_Modifier")
+            conn.commit()
+            line_modifier_columns = set()
+
+        daily_sales_columns = table_columns(conn, "Daily_Sales")
+        conn.executescript(SCHEMA_UPGRADES)
+        if not line_modifier_columns and "modifiers" in order_product_columns:
+            try:
+                _backfill_line_modifiers(conn)
+            except sqlite3.Error:
+                conn.rollback()
+        if ("Order_Product", "unit_price") in added_columns:
+            # A one-off backfill is not an order change; keep it out of Order_Event
+            # and leave stored totals (settled orders keep what was charged) alone
+            conn.execute("DROP TRIGGER IF EXISTS log_order_event_item_changed")
+            conn.execute("DROP TRIGGER IF EXISTS update_order_totals_update")
+            _backfill_line_snapshots(conn)
+            conn.commit()
+            conn.executescript(SCHEMA_UPGRADES)
+        if ("Order_Cart", "tax") in added_columns:
+            _backfill_order_totals(conn)
+        totals_trigger = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'update_order_totals_insert'").fetchone()
+        if totals_trigger and "/ 100.0" in totals_trigger[0]:
+            _upgrade_order_totals(conn)
+        if not daily_sales_columns:
+            rebuild_daily_sales(conn)
+        conn.commit()
+        _schema_ready.add(db_path)
+
+# ── Connection pool ──────────────────────────────────────────────────────────
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that stays open when a caller closes it."""
+
+    # Callers holding the thread's lease: acquire() adds one, close() takes one off
+    holders = 0
+
+    def close(self):
+        # Same effect as closing a plain connection once the last holder closes:
+        # uncommitted work is discarded. A helper that closes the shared lease
+        # inside a caller's open transaction leaves that transaction alone.
+        # Holders that never close keep the rollback for the lease's checkin.
+        self.holders = max(self.holders - 1, 0)
+        if self.holders == 0 and self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        """Really close the underlying connection."""
+        super().close()
+
+
+class _Lease:
+    """Binds a pooled connection to one thread; hands it back when the thread exits."""
+
+    def __init__(self, pool, conn):
+        self.conn = conn
+        weakref.finalize(self, pool._checkin, conn)
+
+
+class ConnectionPool:
+    """Long-lived, pre-tuned connections leased per thread.
+
+    Streamlit runs every rerun of a session on a fresh script thread, so a
+    connection is leased to the thread on first use and returned to the idle
+    list when the thread finishes; the next rerun picks it up again.
+    """
+
+    def __init__(self, db_path, pragmas=CONNECTION_PRAGMAS, max_idle=8, query_only=False):
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.max_idle = max_idle
+        self.query_only = query_only
+        self._local = threading.local()
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.opened = 0
+        self._writer = None
+
+    def _open(self, factory=PooledConnection):
+        if querylog.enabled:
+            factory = querylog.traced_factory(factory)
+        conn = sqlite3.connect(
+            self.db_path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,  # leases move between threads, never shared at once
+            factory=factory,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        ensure_schema(conn, self.db_path)
+        if self.query_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _checkin(self, conn):
+        conn.holders = 0
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.dispose()
+            return
+        # Query tracing was switched since this connection was opened
+        if querylog.is_traced(conn) != querylog.enabled:
+            conn.dispose()
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.dispose()
+
+    def acquire(self):
+        """Return this thread's connection, leasing one from the pool if needed."""
+        lease = getattr(self._local, "lease", None)
+        if lease is not None:
+            with self._lock:
+                self.hits += 1
+            lease.conn.holders += 1
+            return lease.conn
+
+        stale = []
+        with self._lock:
+            conn = self._idle.popleft() if self._idle else None
+            while conn is not None and querylog.is_traced(conn) != querylog.enabled:
+                stale.append(conn)
+                conn = self._idle.popleft() if self._idle else None
+            if conn is None:
+                self.misses += 1
+                self.opened += 1
+            else:
+                self.hits += 1
+        for idle in stale:
+            idle.dispose()
+        if conn is None:
+            conn = self._open()
+        self._local.lease = _Lease(self, conn)
+        conn.holders = 1
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Hand out the pooled connection; commit on success, roll back on error,
+        unless a caller on this thread already had a transaction open.
+        """
+        conn = self.acquire()
+        outer = conn.in_transaction
+        try:
+            yield conn
+            if conn.in_transaction and not outer:
+                conn.commit()
+        except Exception:
+            if not outer:
+                conn.rollback()
+            raise
+        finally:
+            conn.holders = max(conn.holders - 1, 0)
+
+    def writer(self):
+        """The database's write queue, on its own dedicated connection (started on first use)."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = WriteQueue(lambda: self._open(factory=sqlite3.Connection))
+            return self._writer
+
+    def stats(self):
+        """Pool hits, misses and connection counts."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "opened": self.opened,
+                "idle": len(self._idle),
+            }
+
+    def close_all(self):
+        """Stop the writer, close idle connections and release this thread's lease."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        lease = getattr(self._local, "lease", None)
+        if lease is not None:
+            del self._local.lease
+            del lease
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            conn.dispose()
+
+
+_pool = ConnectionPool(DB_PATH)
+_report_pool = ConnectionPool(DB_PATH, REPORT_PRAGMAS, max_idle=4, query_only=True)
+_copy_pool = None
+_copy_lock = threading.Lock()
+
+def set_db_path(db_path):
+    """Point the pools at another database file (benchmarks, tools)."""
+    global _pool, _report_pool, _copy_pool
+    for pool in (_pool, _report_pool, _copy_pool):
+        if pool is not None:
+            pool.close_all()
+    _pool = ConnectionPool(db_path)
+    _report_pool = ConnectionPool(db_path, REPORT_PRAGMAS, max_idle=4, query_only=True)
+    _copy_pool = None
+
+def get_db_path():
+    return _pool.db_path
+
 def get_db_connection():
-    db_path = os.path.expanduser("~/.local/share/pos/pos.database")
-    conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-    conn.row_factory = sqlite3.Row
-    conn.execute('PRAGMA journal_mode=WAL;')
-    return conn
+    return _pool.acquire()
+
+def db_connection():
+    """Context manager over the pooled connection: `with db_connection() as conn:`"""
+    return _pool.connection()
+
+def get_pool_stats():
+    return _pool.stats()
+
+def open_connection():
+    """A dedicated, pre-tuned connection outside the pool (background threads, caches)."""
+    return _pool._open(factory=sqlite3.Connection)
+
+# ── Reporting connections ────────────────────────────────────────────────────
+# Reports read through a separate pool of query_only connections, each report
+# inside one explicit read transaction: all its queries see the same point in
+# time, and the snapshot is released when the report is done so it does not
+# hold back WAL checkpoints. Heavy scans (month-end) can read the report copy
+# instead, a VACUUM INTO copy of the database refreshed every
+# REPORT_COPY_MAX_AGE seconds, and keep the live file out of it entirely.
+
+def report_copy_path():
+    stem = os.path.splitext(os.path.basename(get_db_path()))[0]
+    return os.path.join(os.path.dirname(get_db_path()), "reports", f"{stem}-report.database")
+
+def report_copy_age():
+    """Seconds since the report copy was written, or None if there is none."""
+    try:
+        return datetime.now().timestamp() - os.path.getmtime(report_copy_path())
+    except OSError:
+        return None
+
+def refresh_report_copy(max_age=None):
+    """
+    Write a fresh point-in-time copy of the database for reports (VACUUM INTO)
+    and switch report_snapshot(copy=True) to it. With max_age, a copy younger
+    than max_age seconds is kept.
+    """
+    global _copy_pool
+    path = report_copy_path()
+    temp_path = path + ".tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _copy_lock:
+        age = report_copy_age()
+        if max_age is not None and age is not None and age <= max_age:
+            return
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        conn = open_connection()
+        try:
+            conn.execute("VACUUM INTO ?", (temp_path,))
+        finally:
+            conn.close()
+        os.replace(temp_path, path)
+        _schema_ready.add(path)  # copied from a database with a current schema
+        # Connections still reading the old copy keep it until they are done
+        old_pool, _copy_pool = _copy_pool, None
+    if old_pool is not None:
+        old_pool.close_all()
+
+def _report_copy_pool():
+    """Pool on the report copy, refreshed first if missing or older than REPORT_COPY_MAX_AGE."""
+    global _copy_pool
+    refresh_report_copy(max_age=REPORT_COPY_MAX_AGE)
+    with _copy_lock:
+        if _copy_pool is None:
+            _copy_pool = ConnectionPool(report_copy_path(), REPORT_PRAGMAS, max_idle=4, query_only=True)
+        return _copy_pool
+
+@contextmanager
+def report_snapshot(copy=False):
+    """
+    A query_only connection holding one read transaction for the block:
+    `with report_snapshot() as conn:`. copy=True reads the report copy.
+    Nested blocks on one thread share the outer snapshot.
+    """
+    pool = _report_copy_pool() if copy else _report_pool
+    conn = pool.acquire()
+    try:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            # BEGIN is deferred: the first read takes the snapshot
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+            yield conn
+        finally:
+            conn.rollback()
+    finally:
+        conn.holders = max(conn.holders - 1, 0)
+
+def open_report_connection(copy=False):
+    """A dedicated query_only connection (exports, tools); the caller manages its transactions."""
+    pool = _report_copy_pool() if copy else _report_pool
+    return pool._open(factory=sqlite3.Connection)
+
+# ── Writes ───────────────────────────────────────────────────────────────────
+
+def write(fn, *args, **kwargs):
+    """
+    Run fn(conn, *args, **kwargs) on the write queue (utils/writer.py) and
+    return its result. It is committed together with other terminals'
+    writes; an exception from fn rolls back only fn's changes and is re-raised here.
+    """
+    return _pool.writer().write(fn, *args, **kwargs)
+
+def submit_write(fn, *args, **kwargs):
+    """Like write(), without waiting: returns a concurrent.futures.Future."""
+    return _pool.writer().submit(fn, *args, **kwargs)
+
+def execute_write(conn, sql, params=()):
+    """A single-statement write request; returns the number of rows changed."""
+    return conn.execute(sql, params).rowcount
+
+def get_writer_stats():
+    return _pool.writer().stats()
+
+@contextmanager
+def write_transaction(conn):
+    """
+    Commit the block on success and roll back on error, unless conn is
+    already in a transaction (the write queue's): then its owner decides.
+    """
+    if conn.in_transaction:
+        yield conn
+        return
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 def get_table_data(table_name):
     try:
@@ -42,10 +762,8 @@ def add_item(table_name, item_value):
     """Inserts a new item into the specified generic table."""
     column_name = table_name
     try:
-        with get_db_connection() as conn:
-            conn.execute(f"INSERT INTO {table_name} ({column_name}) VALUES (?)", (item_value,))
-            conn.commit()
-            st.success(f"Added new {table_name}: **{item_value}**")
+        write(execute_write, f"INSERT INTO {table_name} ({column_name}) VALUES (?)", (item_value,))
+        st.success(f"Added new {table_name}: **{item_value}**")
     except sqlite3.IntegrityError:
         st.warning(f"Error: {item_value} already exists in {table_name}.")
     except Exception as e:
@@ -53,21 +771,16 @@ def add_item(table_name, item_value):
         
 def update_row(table_name, row_id_col, row_data):
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            set_clause = ', '.join([f"{col} = ?" for col in row_data.keys() if col != row_id_col])
-            values = [row_data[col] for col in row_data.keys() if col != row_id_col]
-            values.append(row_data[row_id_col])
-            cursor.execute(f"UPDATE {table_name} SET {set_clause} WHERE {row_id_col} = ?", values)
-            conn.commit()
+        set_clause = ', '.join([f"{col} = ?" for col in row_data.keys() if col != row_id_col])
+        values = [row_data[col] for col in row_data.keys() if col != row_id_col]
+        values.append(row_data[row_id_col])
+        write(execute_write, f"UPDATE {table_name} SET {set_clause} WHERE {row_id_col} = ?", values)
     except Exception as e:
         st.error(f"Error updating row in Table {table_name}: {e}")
 
 def delete_row(table_name, row_id_col, row_id):
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(f"DELETE FROM {table_name} WHERE {row_id_col} = ?", (row_id,))
+        write(execute_write, f"DELETE FROM {table_name} WHERE {row_id_col} = ?", (row_id,))
     except Exception as e:
         st.error(f"Error deleting row in Table {table_name}: {e}")
 
@@ -83,10 +796,12 @@ def get_order_details():
             oc.subtotal,
             oc.note,                   
             op.product_id,
-            op.modifiers,
+            op.order_product_id,
             pi.description as product_description,
             op.product_quantity,
-            pi.price as product_price
+            op.unit_price as product_price,
+            op.modifier_total,
+            op.tax_rate
         FROM Order_Cart oc
         LEFT JOIN Order_Product op ON oc.order_id = op.order_id
         LEFT JOIN Product pi ON op.product_id = pi.product_id
@@ -98,33 +813,30 @@ def get_order_details():
     conn.close()
     return results
 
-# Get modifier details for a list of modifier IDs
-def get_modifiers_details(modifier_ids_str):
+# ── Order event stream ───────────────────────────────────────────────────────
+
+def get_last_event_seq():
+    """Highest Order_Event sequence number (0 when the log is empty)."""
+    conn = get_db_connection()
+    seq = conn.execute("SELECT COALESCE(MAX(event_seq), 0) FROM Order_Event").fetchone()[0]
+    conn.close()
+    return seq
+
+def get_events_since(seq, order_id=None, limit=None):
     """
-    Parse modifier IDs string and fetch their details
-    modifier_ids_str: "12,15,18" format
-    Returns: list of dicts with modifier info
+    Order events with event_seq > seq, oldest first (a primary-key range scan).
+    Returns: list of dicts with event_seq, order_id, event_type, order_status, timestamp
     """
-    if not modifier_ids_str:
-        return []
-    
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    modifier_ids = modifier_ids_str.split(',')
-    placeholders = ','.join(['?' for _ in modifier_ids])
-    
-    cursor.execute(f"""
-        SELECT 
-            modifier_id,
-            description,
-            price
-        FROM Modifier
-        WHERE modifier_id IN ({placeholders})
-        AND status = 1
-    """, modifier_ids)
-    
-    modifiers = cursor.fetchall()
+    query = "SELECT event_seq, order_id, event_type, order_status, timestamp FROM Order_Event WHERE event_seq > ?"
+    params = [seq]
+    if order_id is not None:
+        query += " AND order_id = ?"
+        params.append(order_id)
+    query += " ORDER BY event_seq"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    events = [dict(row) for row in conn.execute(query, params)]
     conn.close()
-    
-    return [dict(mod) for mod in modifiers]
+    return events
@@ -0,0 +1,149 @@
+import argparse
+import csv
+import os
+import sys
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.database import open_report_connection, set_db_path, get_db_path
+from utils.catalog import get_menu_catalog
+from utils.archive import history_sources
+from utils.reports import TRANSACTION_QUERY, KEY_COLUMNS, count_transactions, timestamp_range
+from utils.tax import get_tax_table
+
+# ── Transaction export ───────────────────────────────────────────────────────
+# Streams the Order_History / Order_Product join to CSV or Parquet in chunks
+# of CHUNK_SIZE rows (cursor.fetchmany), so memory stays flat however long the
+# date range is. Runs on its own read-only connection, in one snapshot, and
+# reads archived months too; copy=True reads the report copy instead of the
+# live database (long exports then hold nothing back on it).
+
+CHUNK_SIZE = 10000
+
+EXPORT_COLUMNS = [
+    "order_id", "order_status", "timestamp", "product_description",
+    "price", "product_quantity", "subtotal", "total_tax", "total_amount",
+]
+
+PARQUET_SCHEMA = pa.schema([
+    ("order_id", pa.int64()),
+    ("order_status", pa.string()),
+    ("timestamp", pa.string()),
+    ("product_description", pa.string()),
+    ("price", pa.int64()),
+    ("product_quantity", pa.int64()),
+    ("subtotal", pa.int64()),
+    ("total_tax", pa.int64()),
+    ("total_amount", pa.int64()),
+])
+
+
+def iter_transaction_chunks(start_date, end_date, chunk_size=CHUNK_SIZE, progress=None, copy=False):
+    """
+    Yield lists of rows (tuples in EXPORT_COLUMNS order) for the date range,
+    live database first, then archived months newest first.
+    progress(rows_done, total_rows) is called after each chunk.
+    """
+    catalog = get_menu_catalog()
+    tax_table = get_tax_table()
+    conn = open_report_connection(copy)
+    try:
+        conn.execute("BEGIN")  # the count and the rows from one snapshot
+        total_rows = count_transactions(conn, start_date, end_date)
+        start, end = timestamp_range(start_date, end_date)
+        done = 0
+        for source in history_sources(conn, start, end):
+            cursor = source.execute(TRANSACTION_QUERY.format(page_filter="", limit=""),
+                                    {"start": start, "end": end})
+            columns = [col[0] for col in cursor.description]
+            product_index = columns.index("product_id")
+            subtotal_index = columns.index("subtotal")
+            rate_index = columns.index("tax_rate")
+            keep = [i for i, name in enumerate(columns) if name not in KEY_COLUMNS and i != rate_index]
+            description_index = keep.index(product_index)
+
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                # Tax of the whole chunk in one pass
+                taxes = tax_table.line_tax([row[subtotal_index] or 0 for row in rows],
+                                           [row[product_index] for row in rows],
+                                           [row[rate_index] for row in rows]).tolist()
+                chunk = []
+                for row, tax in zip(rows, taxes):
+                    values = [row[i] for i in keep]
+                    # Description from the in-memory menu, in place of product_id
+                    values[description_index] = catalog.product_name(row[product_index])
+                    subtotal = row[subtotal_index]
+                    if subtotal is None:  # an order without lines
+                        values += [None, None]
+                    else:
+                        values += [tax, subtotal + tax]
+                    chunk.append(tuple(values))
+                done += len(chunk)
+                yield chunk
+                if progress:
+                    progress(done, total_rows)
+    finally:
+        conn.close()
+
+def export_csv(path, start_date, end_date, chunk_size=CHUNK_SIZE, progress=None, copy=False):
+    """Write the range to a CSV file; returns the number of rows written."""
+    rows_written = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for chunk in iter_transaction_chunks(start_date, end_date, chunk_size, progress, copy):
+            writer.writerows(chunk)
+            rows_written += len(chunk)
+    return rows_written
+
+def export_parquet(path, start_date, end_date, chunk_size=CHUNK_SIZE, progress=None, copy=False):
+    """Write the range to a Parquet file, one row group per chunk; returns the number of rows written."""
+    rows_written = 0
+    with pq.ParquetWriter(path, PARQUET_SCHEMA) as writer:
+        for chunk in iter_transaction_chunks(start_date, end_date, chunk_size, progress, copy):
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, PARQUET_SCHEMA)],
+                schema=PARQUET_SCHEMA))
+            rows_written += len(chunk)
+        if rows_written == 0:
+            writer.write_table(PARQUET_SCHEMA.empty_table())
+    return rows_written
+
+EXPORTERS = {"csv": export_csv, "parquet": export_parquet}
+
+def export_dir():
+    """Exports are written next to the database file."""
+    return os.path.join(os.path.dirname(get_db_path()), "exports")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.export",
+        description="Export transactions (Order_History joined with Order_Product) to CSV or Parquet.")
+    parser.add_argument("--start", required=True, type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, type=date.fromisoformat, help="last day, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--format", choices=sorted(EXPORTERS), default="csv")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--db", help="database file (default: POS_DB_PATH or the app database)")
+    parser.add_argument("--report-copy", action="store_true",
+                        help="read the report copy (refreshed first if stale) instead of the live database")
+    parser.add_argument("-o", "--output", required=True, help="output file")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        set_db_path(args.db)
+
+    def progress(done, total):
+        print(f"\r{done:,} / {total:,} rows", end="", file=sys.stderr, flush=True)
+
+    rows = EXPORTERS[args.format](args.output, args.start, args.end, args.chunk_size, progress, args.report_copy)
+    print(f"\nExported {rows:,} rows to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
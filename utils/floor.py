@@ -0,0 +1,179 @@
+import threading
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+import streamlit as st
+
+from utils.database import open_connection, get_db_path, ORDER_CREATED, ORDER_CONFIRMED
+
+# Service_Area.status values
+AREA_AVAILABLE = 0
+AREA_OCCUPIED = 1
+
+ServiceArea = namedtuple("ServiceArea", "service_area_id description status claim_token timestamp "
+                                        "table_type capacity row_idx col_idx")
+
+
+class FloorState:
+    """Process-wide copy of Service_Area for the floor grid.
+
+    Works like the menu catalog: `PRAGMA data_version` tells whether anything
+    was committed since the last check, and only then is the Floor_Version
+    counter (bumped by triggers on Service_Area) read. The areas are reloaded
+    only when that counter moves, so a rerun of the floor costs no query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self._db_path = None
+        self._data_version = None
+        self.version = None
+        self.loads = 0
+        self.areas = ()
+
+    def refresh(self):
+        """Reload the areas if they changed; returns True when a reload happened."""
+        with self._lock:
+            if self._db_path != get_db_path():
+                if self._conn is not None:
+                    self._conn.close()
+                self._conn = open_connection()
+                self._db_path = get_db_path()
+                self.version = None
+            conn = self._conn
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if self.version is not None and data_version == self._data_version:
+                return False
+            self._data_version = data_version
+
+            conn.execute("BEGIN")
+            try:
+                version = conn.execute(
+                    "SELECT version FROM Floor_Version WHERE floor_version_id = 1").fetchone()[0]
+                if version == self.version:
+                    return False
+                self.areas = tuple(ServiceArea(*row) for row in conn.execute(
+                    "SELECT service_area_id, description, status, claim_token, timestamp, "
+                    "table_type, capacity, row_idx, col_idx "
+                    "FROM Service_Area ORDER BY service_area_id"))
+                self.version = version
+                self.loads += 1
+                return True
+            finally:
+                conn.execute("COMMIT")
+
+    def invalidate(self):
+        """Force a reload on the next refresh()."""
+        with self._lock:
+            self.version = None
+
+    def occupied(self):
+        return [area for area in self.areas if area.status != AREA_AVAILABLE]
+
+    def placed(self):
+        """{(row, col): area} of the areas on the floor plan."""
+        return {(area.row_idx, area.col_idx): area for area in self.areas if area.row_idx is not None}
+
+    def grid_size(self):
+        """(rows, cols) spanned by the floor plan, (0, 0) without one."""
+        cells = self.placed()
+        if not cells:
+            return 0, 0
+        return max(row for row, _ in cells) + 1, max(col for _, col in cells) + 1
+
+
+_floor = FloorState()
+
+def get_floor_state():
+    """Return the shared floor state, reloaded only if a service area changed."""
+    _floor.refresh()
+    return _floor
+
+def session_claim_token():
+    """This browser session's claim token, kept in session_state."""
+    if "claim_token" not in st.session_state:
+        st.session_state.claim_token = uuid.uuid4().hex
+    return st.session_state.claim_token
+
+# ── Seat claims ──────────────────────────────────────────────────────────────
+# Write requests (run them with utils.database.write). A claim is a
+# compare-and-set: the UPDATE only matches while the area is still available,
+# so when two servers tap the same table one gets True and the other False.
+
+def claim_area(conn, service_area_id, token):
+    """Seat service_area_id for token if it is available (or already token's); returns True if claimed."""
+    return conn.execute(f"""
+        UPDATE Service_Area SET status = {AREA_OCCUPIED}, claim_token = ?, timestamp = ?
+        WHERE service_area_id = ? AND (status = {AREA_AVAILABLE} OR claim_token = ?)
+    """, (token, datetime.now().isoformat(), service_area_id, token)).rowcount == 1
+
+def release_area(conn, service_area_id, token=None):
+    """Make service_area_id available again; with token, only if token holds it. Returns True if released."""
+    return conn.execute(f"""
+        UPDATE Service_Area SET status = {AREA_AVAILABLE}, claim_token = NULL, timestamp = NULL
+        WHERE service_area_id = ? AND (? IS NULL OR claim_token = ?)
+    """, (service_area_id, token, token)).rowcount == 1
+
+# ── Floor plan ───────────────────────────────────────────────────────────────
+# The layout designer edits {(row, col): {"type", "capacity"}}. Saving writes
+# only the difference with Service_Area, in the writer's transaction: cells
+# that changed shape are updated, removed cells are taken off the plan (the
+# area and its order history stay), and new cells reuse areas that are off
+# the plan before new areas are inserted, so moving a table keeps its id.
+# Busy areas (seated or with an open order) are never removed, retyped or
+# reused; their cells come back as conflicts and keep their saved table.
+
+# Seated, or with an order that is not paid or voided yet
+_BUSY_SQL = f"""(status != {AREA_AVAILABLE} OR EXISTS (
+    SELECT 1 FROM Order_Cart oc WHERE oc.service_area_id = Service_Area.service_area_id
+      AND oc.order_status IN ({ORDER_CREATED}, {ORDER_CONFIRMED})))"""
+
+def area_description(table_type, capacity):
+    return f"{table_type} table for {capacity}"
+
+def save_layout(conn, layout):
+    """
+    Write request: make the placed Service_Area rows match layout. Returns
+    (counts per change, {(row, col): area description} of the busy areas
+    that were left as they are).
+    """
+    placed = {(row[1], row[2]): row for row in conn.execute(
+        "SELECT service_area_id, row_idx, col_idx, table_type, capacity, description, "
+        f"{_BUSY_SQL} FROM Service_Area WHERE row_idx IS NOT NULL")}
+
+    removed, changed, conflicts = [], [], {}
+    for cell, (area_id, _, _, table_type, capacity, description, busy) in placed.items():
+        table = layout.get(cell)
+        if table is not None and (table_type, capacity) == (table["type"], table["capacity"]):
+            continue
+        if busy:
+            conflicts[cell] = description
+        elif table is None:
+            removed.append((area_id,))
+        else:
+            changed.append((table["type"], table["capacity"],
+                            area_description(table["type"], table["capacity"]), area_id))
+    added = [(cell, table) for cell, table in sorted(layout.items()) if cell not in placed]
+
+    conn.executemany("UPDATE Service_Area SET row_idx = NULL, col_idx = NULL WHERE service_area_id = ?", removed)
+    conn.executemany(
+        "UPDATE Service_Area SET table_type = ?, capacity = ?, description = ? WHERE service_area_id = ?", changed)
+
+    spare = [row[0] for row in conn.execute(
+        f"SELECT service_area_id FROM Service_Area WHERE row_idx IS NULL AND NOT {_BUSY_SQL} "
+        "ORDER BY service_area_id LIMIT ?", (len(added),))]
+    reused, inserted = added[:len(spare)], added[len(spare):]
+    conn.executemany(
+        "UPDATE Service_Area SET table_type = ?, capacity = ?, description = ?, row_idx = ?, col_idx = ? "
+        "WHERE service_area_id = ?",
+        [(table["type"], table["capacity"], area_description(table["type"], table["capacity"]), row, col, area_id)
+         for ((row, col), table), area_id in zip(reused, spare)])
+    conn.executemany(
+        "INSERT INTO Service_Area (description, status, table_type, capacity, row_idx, col_idx) "
+        f"VALUES (?, {AREA_AVAILABLE}, ?, ?, ?, ?)",
+        [(area_description(table["type"], table["capacity"]), table["type"], table["capacity"], row, col)
+         for (row, col), table in inserted])
+    counts = {"removed": len(removed), "changed": len(changed), "placed": len(reused), "added": len(inserted)}
+    return counts, conflicts
@@ -0,0 +1,79 @@
+import streamlit as st
+
+# ── Floor plan grid component ────────────────────────────────────────────────
+# The layout designer used to draw its grid as rows × cols st.button widgets
+# (400 at 20×20), all rebuilt on every click. This is the whole grid as one
+# element: the browser lays out the cells with CSS grid and a click sends
+# back {"row", "col"} as a trigger value, so a click costs one small rerun
+# and one element instead of hundreds of widgets.
+
+_CSS = """
+.floor-grid {
+    display: grid;
+    gap: 4px;
+}
+.floor-cell {
+    min-height: 64px;
+    border: 1px dashed var(--st-border-color, #ccc);
+    border-radius: 4px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    cursor: pointer;
+    color: #999;
+    font-size: 14px;
+    user-select: none;
+}
+.floor-cell:hover {
+    background: var(--st-secondary-background-color, #f0f2f6);
+}
+.floor-cell.placed {
+    border-style: solid;
+}
+"""
+
+_JS = """
+export default function(component) {
+    const { data, setTriggerValue, parentElement } = component;
+    let grid = parentElement.querySelector('.floor-grid');
+    if (!grid) {
+        grid = document.createElement('div');
+        grid.className = 'floor-grid';
+        parentElement.appendChild(grid);
+    }
+    grid.style.gridTemplateColumns = `repeat(${data.cols}, minmax(0, 1fr))`;
+    const cells = [];
+    for (let row = 0; row < data.rows; row++) {
+        for (let col = 0; col < data.cols; col++) {
+            const html = data.cells[`${row},${col}`];
+            const cell = document.createElement('div');
+            cell.className = html ? 'floor-cell placed' : 'floor-cell';
+            cell.innerHTML = html || data.empty;
+            cell.onclick = () => setTriggerValue('clicked', { row, col });
+            cells.push(cell);
+        }
+    }
+    grid.replaceChildren(...cells);
+}
+"""
+
+_floor_plan = st.components.v2.component("floor_plan_grid", css=_CSS, js=_JS)
+
+
+def floor_plan_grid(rows, cols, cells, key, on_click, empty="[ + ]"):
+    """
+    Draw a rows × cols grid as one component. cells maps (row, col) to the
+    trusted HTML shown in that cell; other cells show `empty`. Clicking a
+    cell calls on_click(row, col) before the rerun.
+    """
+    def clicked():
+        cell = st.session_state[key].clicked
+        if cell:
+            on_click(cell["row"], cell["col"])
+
+    return _floor_plan(
+        key=key,
+        data={"rows": rows, "cols": cols, "empty": empty,
+              "cells": {f"{row},{col}": html for (row, col), html in cells.items()}},
+        on_clicked_change=clicked,
+    )
@@ -0,0 +1,219 @@
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from utils.database import suspended_triggers, rebuild_daily_sales, ORDER_CREATED, ORDER_CONFIRMED, ORDER_PAID, ORDER_VOIDED
+from utils.money import DEFAULT_TAX_RATE, line_tax
+from utils.performance import SCRIPT_PATH, build_restaurant, popularity_weights
+
+# ── Synthetic history generator ──────────────────────────────────────────────
+# Builds a large, realistic pos.database for stress-testing reports, KDS and
+# CFD queries: orders with lines, options, status history (created →
+# confirmed → paid, a few voided), tips and customers. Volume follows weekday
+# and hourly seasonality, product and customer popularity are skewed, and
+# the same seed always gives the same database. Columns are generated with
+# NumPy and bulk-inserted with executemany in one transaction, with the
+# tables' triggers and indexes suspended; indexes and Daily_Sales are rebuilt
+# at the end.
+#
+#   python -m utils.generate -o big.database --orders 1700000 --days 730
+
+# Relative volume by weekday (Monday first) and by opening hour
+WEEKDAY_WEIGHTS = (0.9, 0.9, 1.0, 1.05, 1.3, 1.4, 1.15)
+HOUR_WEIGHTS = {10: 0.3, 11: 1.0, 12: 2.0, 13: 1.6, 14: 0.6, 15: 0.4,
+                16: 0.5, 17: 1.1, 18: 1.8, 19: 1.7, 20: 1.0, 21: 0.5}
+
+VOID_RATE = 0.02
+CUSTOMER_RATE = 0.3      # share of orders with a customer attached
+OPTION_RATE = 0.25       # share of lines with an option
+TIP_PERCENTS = (0, 10, 15, 18, 20)
+TIP_WEIGHTS = (0.35, 0.2, 0.25, 0.1, 0.1)
+
+CHUNK_ROWS = 500000
+
+
+def _normalized(weights):
+    weights = np.asarray(weights, dtype=float)
+    return weights / weights.sum()
+
+def _insert(conn, sql, columns):
+    """executemany over parallel NumPy columns, CHUNK_ROWS rows at a time."""
+    for start in range(0, len(columns[0]), CHUNK_ROWS):
+        conn.executemany(sql, zip(*(column[start:start + CHUNK_ROWS].tolist() for column in columns)))
+
+def _epoch_seconds(day):
+    return (day - date(1970, 1, 1)).days * 86400
+
+def _load_menu(conn):
+    """Price, tax and options of the menu as arrays indexed by product_id."""
+    products = np.array(conn.execute("SELECT product_id, price, COALESCE(tax, ?) FROM Product WHERE status = 1", (DEFAULT_TAX_RATE,)).fetchall())
+    size = int(products[:, 0].max()) + 1
+    price = np.zeros(size, dtype=np.int64)
+    tax = np.zeros(size)
+    price[products[:, 0].astype(int)] = products[:, 1]
+    tax[products[:, 0].astype(int)] = products[:, 2]
+
+    modifiers = np.array(conn.execute(
+        "SELECT modifier_id, product_id, COALESCE(price, 0) FROM Modifier "
+        "WHERE status = 1 AND product_id IS NOT NULL ORDER BY product_id, modifier_id"
+    ).fetchall(), dtype=np.int64).reshape(-1, 3)
+    counts = np.bincount(modifiers[:, 1], minlength=size)[:size]
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return products[:, 0].astype(np.int64), price, tax, modifiers, counts, offsets
+
+def generate(db_path, orders=100000, days=365, end_day=None, customers=5000, tables=30,
+             products=None, seed=42, progress=print):
+    """Create db_path (which must not exist) filled with synthetic history."""
+    rng = np.random.default_rng(seed)
+    end_day = end_day or date.today()
+    start_day = end_day - timedelta(days=days - 1)
+
+    if products:
+        build_restaurant(db_path, products=products, tables=tables, seed=seed)
+    else:
+        with sqlite3.connect(db_path) as conn, open(SCRIPT_PATH) as f:
+            conn.executescript(f.read())
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    tables = conn.execute("SELECT COUNT(*) FROM Service_Area").fetchone()[0]
+    for pragma in ("PRAGMA journal_mode=OFF", "PRAGMA synchronous=OFF",
+                   "PRAGMA cache_size=-262144", "PRAGMA temp_store=MEMORY"):
+        conn.execute(pragma)
+
+    product_ids, price_by_id, tax_by_id, modifiers, modifier_counts, modifier_offsets = _load_menu(conn)
+
+    # When: weekday seasonality with a slow upward trend and day-to-day noise
+    day_numbers = np.arange(days)
+    weekdays = (np.array([start_day.weekday()]) + day_numbers) % 7
+    day_weights = (np.take(WEEKDAY_WEIGHTS, weekdays) * np.linspace(0.9, 1.1, days)
+                   * rng.normal(1, 0.08, days).clip(0.5))
+    hours = np.array(list(HOUR_WEIGHTS))
+    created = (_epoch_seconds(start_day)
+               + rng.choice(days, orders, p=_normalized(day_weights)) * 86400
+               + rng.choice(hours, orders, p=_normalized(list(HOUR_WEIGHTS.values()))) * 3600
+               + rng.integers(0, 3600, orders))
+    created.sort()  # order ids follow time
+    order_ids = np.arange(1, orders + 1)
+    confirmed = created + rng.integers(300, 1500, orders)
+    paid = confirmed + rng.integers(900, 3600, orders)
+    voided = rng.random(orders) < VOID_RATE
+    status = np.where(voided, ORDER_VOIDED, ORDER_PAID)
+    service_area = rng.integers(1, tables + 1, orders)
+
+    # Who: regulars order more often than occasional customers
+    customer_ids = 8080000000 + rng.choice(10000000, customers, replace=False)
+    has_customer = rng.random(orders) < CUSTOMER_RATE
+    customer_index = rng.choice(customers, orders, p=_normalized(popularity_weights(customers, 0.8)))
+
+    # What: 1-8 lines per order, best sellers first
+    lines_per_order = 1 + np.minimum(rng.poisson(1.5, orders), 7)
+    line_count = int(lines_per_order.sum())
+    line_order = np.repeat(np.arange(orders), lines_per_order)
+    rng.shuffle(product_ids)
+    line_product = rng.choice(product_ids, line_count, p=_normalized(popularity_weights(len(product_ids))))
+    quantity = rng.choice((1, 1, 1, 2, 3), line_count)
+    unit_price = price_by_id[line_product]
+    tax_rate = tax_by_id[line_product]
+
+    options = modifier_counts[line_product]
+    has_option = (rng.random(line_count) < OPTION_RATE) & (options > 0)
+    option_row = modifier_offsets[line_product] + (rng.random(line_count) * options).astype(np.int64)
+    option_lines = np.flatnonzero(has_option)
+    option_row = option_row[option_lines]
+    modifier_total = np.zeros(line_count, dtype=np.int64)
+    modifier_total[option_lines] = modifiers[option_row, 2]
+
+    # Order totals, rounded per line like the update_order_totals_* triggers
+    line_amount = (unit_price + modifier_total) * quantity
+    subtotal = np.bincount(line_order, unit_price * quantity, orders).astype(np.int64)
+    option_total = np.bincount(line_order, modifier_total * quantity, orders).astype(np.int64)
+    tax = np.bincount(line_order, line_tax(line_amount, tax_rate), orders).astype(np.int64)
+    tip = np.where(voided, 0, (subtotal + option_total)
+                   * rng.choice(TIP_PERCENTS, orders, p=TIP_WEIGHTS) // 100)
+    total = subtotal + option_total + tax + tip
+
+    # Status history: created, then confirmed and paid, or voided
+    history_order = np.concatenate((order_ids, order_ids, order_ids[~voided]))
+    history_status = np.concatenate((np.full(orders, ORDER_CREATED),
+                                      np.where(voided, ORDER_VOIDED, ORDER_CONFIRMED),
+                                      np.full(int((~voided).sum()), ORDER_PAID)))
+    history_time = np.concatenate((created, confirmed, paid[~voided]))
+    by_time = np.argsort(history_time, kind="stable")
+
+    points = np.bincount(customer_index[has_customer & ~voided], total[has_customer & ~voided], customers) // 100
+
+    conn.execute("BEGIN")
+    # Indexes are cheaper to build once, sorted, than to maintain row by row
+    loaded = ("Order_Cart", "Order_Product", "Order_Product_Modifier", "Order_History", "Customer")
+    indexes = conn.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({",".join("?" * len(loaded))})
+    """, loaded).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    with suspended_triggers(conn, *loaded):
+        _insert(conn, "INSERT INTO Customer (customer_id, description, point) VALUES (?, ?, ?)",
+                [customer_ids, np.char.add("Guest ", np.arange(1, customers + 1).astype(str)), points.astype(np.int64)])
+        progress(f"{customers:,} customers")
+        _insert(conn, """
+            INSERT INTO Order_Cart (order_id, order_status, service_area_id, customer_id,
+                                    subtotal, modifier_total, tax, tip, total, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+        """, [order_ids, status, service_area,
+              np.where(has_customer, customer_ids[customer_index], None),
+              subtotal, option_total, tax, tip, total, created])
+        progress(f"{orders:,} orders")
+        line_ids = np.arange(1, line_count + 1)
+        _insert(conn, """
+            INSERT INTO Order_Product (order_product_id, order_id, product_id, product_quantity,
+                                       unit_price, modifier_total, tax_rate)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [line_ids, order_ids[line_order], line_product, quantity, unit_price, modifier_total, tax_rate])
+        progress(f"{line_count:,} order lines")
+        _insert(conn, "INSERT INTO Order_Product_Modifier (order_product_id, order_id, modifier_id, price) VALUES (?, ?, ?, ?)",
+                [line_ids[option_lines], order_ids[line_order[option_lines]],
+                 modifiers[option_row, 0], modifiers[option_row, 2]])
+        progress(f"{len(option_lines):,} line options")
+        _insert(conn, "INSERT INTO Order_History (order_id, order_status, timestamp) VALUES (?, ?, datetime(?, 'unixepoch'))",
+                [history_order[by_time], history_status[by_time], history_time[by_time]])
+        progress(f"{len(by_time):,} history rows")
+        for _, sql in indexes:
+            conn.execute(sql)
+        progress("indexes")
+        rebuild_daily_sales(conn)
+    conn.execute("COMMIT")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA analysis_limit=1000")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.generate",
+                                     description="Build a large synthetic POS database for stress tests.")
+    parser.add_argument("-o", "--output", required=True, help="database file to create")
+    parser.add_argument("--orders", type=int, default=100000, help="orders (about 3 history rows each)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--end", type=date.fromisoformat, help="last day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--products", type=int, help="generate a menu of this size (default: the menu in `script`)")
+    parser.add_argument("--tables", type=int, default=30, help="tables of a generated menu's floor")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="replace the output file if it exists")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.output):
+        if not args.force:
+            parser.error(f"{args.output} exists (use --force to replace it)")
+        os.remove(args.output)
+
+    start = time.perf_counter()
+    generate(args.output, args.orders, args.days, args.end, args.customers, args.tables, args.products, args.seed,
+             progress=lambda message: print(f"{time.perf_counter() - start:7.1f} s  {message}"))
+    print(f"{time.perf_counter() - start:7.1f} s  done: {args.output}")
+
+if __name__ == "__main__":
+    main()
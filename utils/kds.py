@@ -0,0 +1,92 @@
+from utils.database import report_snapshot
+
+# Largest incremental change set fetched with an IN (...) list; beyond it the board reloads
+MAX_INCREMENTAL_ORDERS = 500
+
+# One joined query for the whole open board (order_status = 1)
+BOARD_QUERY = """
+    SELECT
+        oc.order_id,
+        oc.service_area_id,
+        oc.order_status,
+        oc.created_at,
+        op.product_id,
+        pi.description as product_name,
+        op.product_quantity
+    FROM Order_Cart oc
+    INNER JOIN Order_Product op ON oc.order_id = op.order_id
+    INNER JOIN Product pi ON op.product_id = pi.product_id
+    WHERE oc.order_status = 1 {order_filter}
+    ORDER BY oc.created_at ASC, oc.order_id, pi.description
+"""
+
+
+class KdsBoard:
+    """Open kitchen tickets, loaded in one query and refreshed incrementally.
+
+    The first refresh loads the whole board. Later refreshes read the
+    Order_Event stream past the last seen event_seq (the high-water mark)
+    and reload only the tickets that were created or changed since then.
+    """
+
+    def __init__(self):
+        self.tickets = {}
+        self.high_water = None
+
+    def _group(self, rows):
+        tickets = {}
+        for row in rows:
+            ticket = tickets.get(row["order_id"])
+            if ticket is None:
+                ticket = tickets[row["order_id"]] = {
+                    "order_id": row["order_id"],
+                    "service_area_id": row["service_area_id"],
+                    "order_status": row["order_status"],
+                    "created_at": row["created_at"],
+                    "items": [],
+                }
+            ticket["items"].append({
+                "order_id": row["order_id"],
+                "product_id": row["product_id"],
+                "product_name": row["product_name"],
+                "product_quantity": row["product_quantity"],
+            })
+        return tickets
+
+    def _high_water(self, conn):
+        return conn.execute("SELECT COALESCE(MAX(event_seq), 0) FROM Order_Event").fetchone()[0]
+
+    def refresh(self):
+        """Bring the board up to date; returns the set of order ids that changed."""
+        # One read snapshot, on a read-only connection, for the high-water mark and the rows
+        with report_snapshot() as conn:
+            return self._refresh(conn)
+
+    def _refresh(self, conn):
+        if self.high_water is None:
+            new_high_water = self._high_water(conn)
+            self.tickets = self._group(conn.execute(BOARD_QUERY.format(order_filter="")))
+            self.high_water = new_high_water
+            return set(self.tickets)
+
+        changed = [row[0] for row in conn.execute(
+            "SELECT DISTINCT order_id FROM Order_Event WHERE event_seq > ?", (self.high_water,))]
+        if not changed:
+            return set()
+        if len(changed) > MAX_INCREMENTAL_ORDERS:
+            self.high_water = None
+            return self._refresh(conn)
+
+        new_high_water = self._high_water(conn)
+        placeholders = ",".join("?" * len(changed))
+        fresh = self._group(conn.execute(
+            BOARD_QUERY.format(order_filter=f"AND oc.order_id IN ({placeholders})"), changed))
+        for order_id in changed:
+            self.tickets.pop(order_id, None)
+        self.tickets.update(fresh)
+        self.high_water = new_high_water
+        return set(changed)
+
+    def open_tickets(self):
+        """Tickets oldest first, as the kitchen works them."""
+        return sorted(self.tickets.values(), key=lambda t: (t["created_at"] or "", t["order_id"]))
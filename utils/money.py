@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# ── Money ────────────────────────────────────────────────────────────────────
+# All amounts are integer cents. Functions take scalars, lists, NumPy arrays
+# or pandas Series and work on whole columns at once; nothing passes through
+# a float dollar value, so sums and splits never drift by a cent.
+
+# Tax rates are percentages with up to 3 decimals (4.712 → 4712 milli-percent)
+RATE_SCALE = 1000
+
+# Percent, for products without a rate of their own (utils/tax.py and the
+# update_order_totals_* triggers)
+DEFAULT_TAX_RATE = 4.712
+
+
+def parse_cents(text):
+    """Dollar input such as "12.3" or "$1,234.56" → 1230 / 123456 cents; None if invalid."""
+    try:
+        amount = Decimal(str(text).replace("$", "").replace(",", "").strip())
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():
+        return None
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def divide_round(numerator, denominator):
+    """Integer division rounded half away from zero (as SQLite ROUND does)."""
+    numerator = np.asarray(numerator, dtype=np.int64)
+    quotient = (np.abs(numerator) * 2 + denominator) // (denominator * 2)
+    return np.sign(numerator) * quotient
+
+def rate_units(rates):
+    """Tax rate percentages → integer milli-percent."""
+    return np.rint(np.asarray(rates, dtype=float) * RATE_SCALE).astype(np.int64)
+
+def line_tax(amounts, rates):
+    """Tax in cents of each line amount at its rate (percent), rounded per line."""
+    return line_tax_units(amounts, rate_units(rates))
+
+def line_tax_units(amounts, units):
+    """line_tax with rates already in milli-percent (utils/tax.py lookup tables)."""
+    amounts = np.asarray(amounts, dtype=np.int64)
+    return divide_round(amounts * np.asarray(units, dtype=np.int64), 100 * RATE_SCALE)
+
+def split_evenly(total, parts):
+    """Split total into parts amounts that differ by at most one cent; the first ones get the extra cents."""
+    base, remainder = divmod(int(total), int(parts))
+    amounts = np.full(int(parts), base, dtype=np.int64)
+    amounts[:remainder] += 1
+    return amounts
+
+def allocate(total, weights):
+    """
+    Split total in proportion to weights (largest remainder method).
+    The result sums to total exactly; leftover cents go to the largest
+    fractional shares, earlier entries first on ties.
+    """
+    weights = np.asarray(weights, dtype=np.int64)
+    weight_sum = int(weights.sum())
+    if weight_sum == 0:
+        return np.zeros(len(weights), dtype=np.int64)
+    shares, remainders = np.divmod(int(total) * weights, weight_sum)
+    leftover = int(total) - int(shares.sum())
+    order = np.argsort(-remainders, kind="stable")
+    shares[order[:leftover]] += 1
+    return shares
+
+def split_items(prices, assigned):
+    """
+    Each payer's share of the items assigned to them.
+    prices: item prices in cents; assigned: items x payers boolean matrix.
+    An item's price is split evenly between its payers, extra cents to the
+    first of them. Returns: amounts per payer (unassigned items are left out).
+    """
+    prices = np.asarray(prices, dtype=np.int64)
+    assigned = np.asarray(assigned, dtype=bool).reshape(len(prices), -1)
+    counts = assigned.sum(axis=1)
+    base, remainder = np.divmod(prices, np.maximum(counts, 1))
+    rank = np.cumsum(assigned, axis=1) - 1  # position of each payer among the item's payers
+    shares = assigned * (base[:, None] + (rank < remainder[:, None]))
+    return shares.sum(axis=0)
+
+def format_cents(cents):
+    """
+    Format cents as format_price does ("$12.30", "$-1.50"). Scalars give a
+    string; lists, arrays and Series give a Series of strings, with "" for
+    missing values (None, NaN, pd.NA). Fractional cents are rounded half away
+    from zero.
+    """
+    if np.ndim(cents) == 0:
+        if pd.isna(cents):
+            return ""
+        cents = int(Decimal(str(cents)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+        sign, cents = ("-", -cents) if cents < 0 else ("", cents)
+        return f"${sign}{cents // 100}.{cents % 100:02d}"
+
+    values = pd.Series(cents)
+    present = values.notna()
+    amounts = pd.to_numeric(values[present]).to_numpy(dtype=float)
+    whole = pd.Series(np.sign(amounts) * np.floor(np.abs(amounts) + 0.5), index=values.index[present]).astype(np.int64)
+    absolute = whole.abs()
+    sign = pd.Series(np.where(whole < 0, "$-", "$"), index=whole.index)
+    text = (sign + (absolute // 100).astype(str) + "."
+            + (absolute % 100).astype(str).str.zfill(2))
+    result = pd.Series("", index=values.index, dtype=object)
+    result[present] = text
+    return result
+
+def format_columns(df, columns):
+    """Format the money columns of df that are present, one vectorized pass per column."""
+    for column in columns:
+        if column in df.columns:
+            df[column] = format_cents(df[column])
+    return df
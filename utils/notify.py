@@ -0,0 +1,128 @@
+import threading
+import weakref
+from utils.database import open_connection, get_db_path, get_last_event_seq
+
+# How often the watcher checks for commits (a PRAGMA, no table read)
+WATCH_INTERVAL_SECONDS = 0.2
+
+
+class Subscription:
+    """Events matching one subscriber's predicate, delivered by the hub."""
+
+    def __init__(self, hub, predicate):
+        self._hub = hub
+        self._predicate = predicate
+        self._events = []
+        self._wake = threading.Event()
+
+    def matches(self, event):
+        return self._predicate is None or self._predicate(event)
+
+    def deliver(self, events):
+        matching = [e for e in events if self.matches(e)]
+        if matching:
+            self._events.extend(matching)
+            self._wake.set()
+
+    def wait(self, timeout=None):
+        """Block until matching events arrive or timeout; returns the events (possibly [])."""
+        self._wake.wait(timeout)
+        self._wake.clear()
+        events, self._events = self._events, []
+        return events
+
+    def close(self):
+        self._hub._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OrderHub:
+    """In-process pub/sub for order changes.
+
+    A single watcher thread per process tails Order_Event and fans events out
+    to subscribers, so any number of displays cost one cheap check per tick
+    instead of one full page rerun each. `PRAGMA data_version` tells the
+    watcher whether anything was committed (by any process) before it reads
+    the event stream. The watcher runs only while someone is subscribed;
+    subscriptions nobody holds any more (an ended session's) drop out.
+    last_seq is the newest event seen, so a caller can tell from memory
+    whether anything happened since a sequence number it read.
+    publish() delivers events directly, e.g. from a test stand-in.
+    """
+
+    def __init__(self, interval=WATCH_INTERVAL_SECONDS):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = weakref.WeakSet()
+        self._watcher = None
+        self._poke = threading.Event()
+        self.last_seq = None
+
+    def subscribe(self, predicate=None):
+        subscription = Subscription(self, predicate)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._watcher is None or not self._watcher.is_alive():
+                # Start where the caller is, so its catch-up read and the watcher overlap
+                self.last_seq = get_last_event_seq()
+                self._watcher = threading.Thread(target=self._watch, name="order-hub", daemon=True)
+                self._watcher.start()
+        return subscription
+
+    def watch(self):
+        """A subscription that takes no events and only keeps the watcher (and last_seq) running."""
+        return self.subscribe(lambda event: False)
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(events)
+
+    def poke(self):
+        """Check for new events now instead of at the next tick."""
+        self._poke.set()
+
+    def _watch(self):
+        conn = open_connection()
+        db_path = get_db_path()
+        data_version = None
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers or db_path != get_db_path():
+                        self._watcher = None
+                        return
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current != data_version:
+                    data_version = current
+                    self._drain(conn)
+                self._poke.wait(self.interval)
+                self._poke.clear()
+        finally:
+            conn.close()
+
+    def _drain(self, conn):
+        rows = conn.execute("""
+            SELECT event_seq, order_id, event_type, order_status, timestamp
+            FROM Order_Event WHERE event_seq > ? ORDER BY event_seq
+        """, (self.last_seq,)).fetchall()
+        if rows:
+            events = [dict(row) for row in rows]
+            self.last_seq = events[-1]["event_seq"]
+            self.publish(events)
+
+
+_hub = OrderHub()
+
+def get_order_hub():
+    return _hub
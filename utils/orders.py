@@ -0,0 +1,96 @@
+from utils.database import write_transaction, ORDER_CREATED, ORDER_CONFIRMED, ORDER_PAID
+from utils.catalog import get_menu_catalog
+from utils.tax import get_tax_table
+
+# ── Order lifecycle ──────────────────────────────────────────────────────────
+# The writes behind the Order, KDS and Checkout pages. Each function runs one
+# transaction on the connection it is given and raises sqlite3.Error on
+# failure; the pages report errors, benchmarks time the same code. Inside a
+# transaction someone else opened (the write queue's group commit), they
+# leave committing to its owner; pages pass them to database.write().
+
+
+def create_order(conn, service_area_id, cart):
+    """
+    Create an order with its lines, price/tax snapshot and options.
+    cart items: {"product_id", "price" (unit price incl. option),
+                 "modifier_id", "modifier_price", "quantity"}
+    Returns: the new order_id
+    """
+    with write_transaction(conn):
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO Order_Cart (service_area_id, order_status)
+            VALUES (?, ?)
+        ''', (service_area_id, ORDER_CREATED))
+        order_id = cursor.lastrowid
+
+        # Insert items into Order_Product with their price and tax snapshot,
+        # and their option into Order_Product_Modifier
+        # The rate the tax engine would apply, so the stored totals match it
+        tax_table = get_tax_table()
+        for item in cart:
+            cursor.execute('''
+                INSERT INTO Order_Product (order_id, product_id, product_quantity, unit_price, modifier_total, tax_rate)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (order_id, item['product_id'], item['quantity'],
+                  item['price'] - item['modifier_price'], item['modifier_price'],
+                  tax_table.product_rate(item['product_id'])))
+
+            if item.get('modifier_id'):
+                cursor.execute('''
+                    INSERT INTO Order_Product_Modifier (order_product_id, order_id, modifier_id, price)
+                    VALUES (?, ?, ?, ?)
+                ''', (cursor.lastrowid, order_id, item['modifier_id'], item['modifier_price']))
+
+    return order_id
+
+def confirm_order(conn, order_id):
+    """Kitchen is done with the order (order_status 2)."""
+    with write_transaction(conn):
+        conn.execute("""
+            UPDATE Order_Cart
+            SET order_status = ?
+            WHERE order_id = ?
+        """, (ORDER_CONFIRMED, order_id))
+
+def get_checkout_lines(conn, service_area_id):
+    """Lines of the service area's confirmed orders, with each order's stored subtotal and tax."""
+    cursor = conn.execute("""
+        SELECT
+            oc.order_id,
+            oc.service_area_id,
+            oc.subtotal + oc.modifier_total AS order_subtotal,
+            oc.tax AS order_tax,
+            op.product_id,
+            op.product_quantity,
+            op.unit_price + op.modifier_total AS price,
+            op.tax_rate
+        FROM Order_Cart oc
+        LEFT JOIN Order_Product op ON oc.order_id = op.order_id
+        WHERE oc.service_area_id = ? AND oc.order_status = ?
+        ORDER BY oc.order_id, op.order_product_id
+    """, (service_area_id, ORDER_CONFIRMED))
+
+    # Descriptions come from the in-memory menu instead of a Product join
+    catalog = get_menu_catalog()
+    return [dict(row, description=catalog.product_name(row['product_id'])) for row in cursor.fetchall()]
+
+def settle_order(conn, order_ids, total_charged, service_area_id):
+    """Mark the orders paid with the charged total and free the service area."""
+    with write_transaction(conn):
+        cursor = conn.cursor()
+        # Update order status to 3 (settled) and set charged amount
+        for order_id in order_ids:
+            cursor.execute("""
+                UPDATE Order_Cart
+                SET order_status = ?, total = ?
+                WHERE order_id = ?
+            """, (ORDER_PAID, total_charged, order_id))
+
+        # Update service area status to 0 (available)
+        cursor.execute("""
+            UPDATE Service_Area
+            SET status = 0, claim_token = NULL, timestamp = NULL
+            WHERE service_area_id = ?
+        """, (service_area_id,))
@@ -1,27 +1,248 @@
-import sqlite3, time
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime
 
-conn = sqlite3.connect("performance.database")
-conn.execute('PRAGMA journal_mode=WAL;')  # Enable WAL mode
-cur = conn.cursor()
+import numpy as np
 
-start = time.time()
+from utils.database import set_db_path, get_db_connection, write
+from utils.catalog import get_menu_catalog
+from utils.kds import KdsBoard
+from utils import orders as order_ops
+from utils.reports import get_transaction_page, count_transactions, get_sales_summary
 
-# Insert 1000 records
-cur.execute("BEGIN")
-for i in range(1000):
-    cur.execute("""
-        INSERT INTO Order_Cart (order_status, service_area_id, customer_id, subtotal, charged, special_request)
-        VALUES (?, ?, ?, ?, ?, ?)""",
-        (0, (i % 8) + 1, None, 1000 + i * 10, 1100 + i * 10, f'Test order #{i+1}')
-    )
-conn.commit()
+# ── Benchmark: lunch rush replay ─────────────────────────────────────────────
+# Builds a synthetic restaurant from `script` (menu size, tables), then
+# replays a rush of orders through the functions the pages use, the way they
+# call them: create_order (Order), KdsBoard refresh and confirm_order (KDS),
+# get_checkout_lines and settle_order (Checkout), writes through the write
+# queue, and the Transaction History queries. Reports
+# throughput and p50/p95/p99 latency per operation and saves them as JSON.
+#
+#   python -m utils.performance --orders-per-hour 600 --hours 2 -o run.json
+#   python -m utils.performance --compare run.json
 
-# Update 1000 records
-cur.execute("BEGIN")
-cur.execute("UPDATE Order_Cart SET order_status = 1 WHERE order_status = 0")
-conn.commit()
-cur.execute("select * from order_history order by timestamp;")
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "script")
 
-end = time.time()
-print(f"Total time: {end - start:.4f} seconds")
+# Orders waiting in the kitchen and at the till before the oldest moves on
+KITCHEN_BACKLOG = 12
+CHECKOUT_BACKLOG = 8
 
+# Run the history queries after this many orders (a manager glancing at reports)
+HISTORY_EVERY = 50
+
+
+def build_restaurant(db_path, products=60, categories=6, modifiers_per_product=3, tables=30, seed=42):
+    """Create db_path from `script` with a generated menu and floor."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    with open(SCRIPT_PATH) as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        DELETE FROM Modifier; DELETE FROM Product; DELETE FROM Category; DELETE FROM Service_Area;
+    """)
+    conn.executemany("INSERT INTO Category (category_id, description) VALUES (?, ?)",
+                     [(c, f"Category {c}") for c in range(1, categories + 1)])
+    conn.executemany("INSERT INTO Product (product_id, description, category_id, price, tax, status) VALUES (?, ?, ?, ?, 4, 1)",
+                     [(p, f"Product {p}", rng.randint(1, categories), rng.randrange(199, 2499, 50))
+                      for p in range(1, products + 1)])
+    conn.executemany("INSERT INTO Modifier (description, product_id, modifier_group_id, price, status) VALUES (?, ?, 0, ?, 1)",
+                     [(f"Option {m} of {p}", p, rng.choice((0, 0, 50, 100, 150)))
+                      for p in range(1, products + 1) for m in range(1, modifiers_per_product + 1)])
+    conn.executemany("INSERT INTO Service_Area (service_area_id, description, status) VALUES (?, ?, 0)",
+                     [(t, f"Table {t}") for t in range(1, tables + 1)])
+    conn.commit()
+    conn.close()
+
+def popularity_weights(count, skew=1.1):
+    """Zipf-like weights: a few best sellers, a long tail."""
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+class Recorder:
+    """Wall-clock samples per operation name."""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+    def summary(self):
+        operations = {}
+        for name, samples in self.samples.items():
+            ms = np.asarray(samples) * 1000
+            total = float(ms.sum()) / 1000
+            operations[name] = {
+                "count": len(samples),
+                "total_s": round(total, 4),
+                "ops_per_s": round(len(samples) / total, 1) if total else None,
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+        return operations
+
+
+def random_cart(rng, products, weights, modifiers_by_product):
+    cart = []
+    for product in rng.choices(products, weights, k=rng.randint(1, 5)):
+        options = modifiers_by_product.get(product.product_id, ())
+        modifier = rng.choice(options) if options and rng.random() < 0.3 else None
+        modifier_price = modifier.price if modifier else 0
+        cart.append({
+            'product_id': product.product_id,
+            'price': product.price + modifier_price,
+            'modifier_id': modifier.modifier_id if modifier else None,
+            'modifier_price': modifier_price,
+            'quantity': rng.choice((1, 1, 1, 2, 3)),
+        })
+    return cart
+
+def replay_rush(orders_per_hour=240, hours=2, tables=30, seed=42):
+    """Replay orders_per_hour * hours orders as fast as possible; returns the Recorder."""
+    rng = random.Random(seed)
+    recorder = Recorder()
+    catalog = get_menu_catalog()
+    products = [p for p in catalog.products.values() if p.status]
+    weights = popularity_weights(len(products))
+    rng.shuffle(products)
+
+    conn = get_db_connection()
+    board = KdsBoard()
+    kitchen, till = deque(), deque()
+    today = date.today()
+
+    def settle_oldest():
+        order_id, table = till.popleft()
+        with recorder.measure("checkout_lines"):
+            lines = order_ops.get_checkout_lines(conn, table)
+        # Charged as Checkout does: subtotal + stored tax (no tip)
+        total = next((line['order_subtotal'] + line['order_tax'] for line in lines if line['order_id'] == order_id), 0)
+        with recorder.measure("settle_order"):
+            write(order_ops.settle_order, [order_id], total, table)
+
+    def confirm_oldest():
+        order_id, table = kitchen.popleft()
+        with recorder.measure("confirm_order"):
+            write(order_ops.confirm_order, order_id)
+        till.append((order_id, table))
+
+    try:
+        for i in range(orders_per_hour * hours):
+            table = rng.randint(1, tables)
+            cart = random_cart(rng, products, weights, catalog.modifiers_by_product)
+            with recorder.measure("create_order"):
+                order_id = write(order_ops.create_order, table, cart)
+            kitchen.append((order_id, table))
+
+            with recorder.measure("kds_refresh"):
+                board.refresh()
+                board.open_tickets()
+
+            while len(kitchen) > KITCHEN_BACKLOG:
+                confirm_oldest()
+            while len(till) > CHECKOUT_BACKLOG:
+                settle_oldest()
+
+            if i % HISTORY_EVERY == 0:
+                with recorder.measure("history_count"):
+                    count_transactions(conn, today, today)
+                with recorder.measure("history_page"):
+                    get_transaction_page(conn, today, today, 25)
+                with recorder.measure("sales_summary"):
+                    get_sales_summary(conn, today, today)
+
+        while kitchen:
+            confirm_oldest()
+        while till:
+            settle_oldest()
+    finally:
+        conn.close()
+    return recorder
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(SCRIPT_PATH)).stdout.strip() or None
+    except OSError:
+        return None
+
+def print_report(result, baseline=None):
+    print(f"{'operation':<16}{'count':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in result["operations"].items():
+        line = (f"{name:<16}{stats['count']:>8}{stats['ops_per_s'] or 0:>10.1f}"
+                f"{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+        before = (baseline or {}).get("operations", {}).get(name)
+        if before and before["p95_ms"]:
+            line += f"   p95 {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}% vs baseline"
+        print(line)
+    print(f"{result['orders']} orders in {result['wall_s']:.2f} s "
+          f"({result['orders'] / result['wall_s']:.1f} orders/s)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.performance",
+                                     description="Replay a lunch rush through the POS order flow and time it.")
+    parser.add_argument("--products", type=int, default=60)
+    parser.add_argument("--categories", type=int, default=6)
+    parser.add_argument("--modifiers-per-product", type=int, default=3)
+    parser.add_argument("--tables", type=int, default=30)
+    parser.add_argument("--orders-per-hour", type=int, default=240)
+    parser.add_argument("--hours", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="run against this database; built from `script` if it does not exist "
+                                     "(default: a temporary file)")
+    parser.add_argument("-o", "--output", help="save the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare p95 against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        db_path = args.db or os.path.join(tmp, "benchmark.database")
+        if not os.path.exists(db_path):
+            build_restaurant(db_path, args.products, args.categories, args.modifiers_per_product,
+                             args.tables, args.seed)
+        set_db_path(db_path)
+
+        start = time.perf_counter()
+        recorder = replay_rush(args.orders_per_hour, args.hours, args.tables, args.seed)
+        wall = time.perf_counter() - start
+
+    params = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    result = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "params": params,
+        "orders": args.orders_per_hour * args.hours,
+        "wall_s": round(wall, 3),
+        "operations": recorder.summary(),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.querylog import json_lines_log, LOG_BACKUPS
+
+# ── Page render profiler ─────────────────────────────────────────────────────
+# Streamlit reruns the whole page script on every interaction, so the cost of
+# a screen is its cost per rerun times its reruns. profile_page() wraps a page
+# entry point (decorator or `with` block) and, when POS_PAGE_PROFILE=1, logs
+# one JSON line per rerun: wall time split into phases, the session's rerun
+# count for the page, and the elements and widgets sent to the browser.
+#
+#   db       time inside blocks or functions marked with phase("db")
+#   emit     time handing elements to the browser queue
+#   compute  everything else (Python work and building the elements)
+#
+#   python -m utils.profiler      # per-page summary of the metrics file
+
+PAGE_METRICS = os.environ.get("POS_PAGE_METRICS",
+                              os.path.expanduser("~/.local/share/pos/logs/page_metrics.jsonl"))
+
+enabled = os.environ.get("POS_PAGE_PROFILE", "") not in ("", "0")
+_local = threading.local()
+
+
+def set_enabled(on):
+    global enabled
+    enabled = bool(on)
+
+@contextmanager
+def phase(name):
+    """Charge the block's wall time to phase name of the running page profile."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run["phases"][name] = run["phases"].get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+def _count_emitted(run, enqueue):
+    """Wrap a ScriptRunContext's enqueue to time and count the elements it sends."""
+    def counting_enqueue(msg):
+        start = time.perf_counter()
+        try:
+            return enqueue(msg)
+        finally:
+            run["phases"]["emit"] = run["phases"].get("emit", 0.0) + (time.perf_counter() - start) * 1000
+            if msg.WhichOneof("type") == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                run["elements"] += 1
+                if hasattr(getattr(element, element.WhichOneof("type") or "empty", None), "id"):
+                    run["widgets"] += 1
+    return counting_enqueue
+
+def _rerun_count(page):
+    """Count this rerun in the session's per-page rerun counter."""
+    counts = st.session_state.setdefault("_page_reruns", {})
+    counts[page] = counts.get(page, 0) + 1
+    return counts[page]
+
+@contextmanager
+def profile_page(page):
+    """
+    Profile one rerun of a page. Use as `@profile_page("Checkout")` on the
+    entry point or `with profile_page("Checkout"):` around it.
+    """
+    ctx = get_script_run_ctx()
+    if not enabled or ctx is None or getattr(_local, "run", None) is not None:
+        yield
+        return
+
+    run = _local.run = {"phases": {}, "elements": 0, "widgets": 0}
+    ctx.enqueue = _count_emitted(run, ctx.enqueue)
+    outcome = "ok"
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        # st.rerun() / st.switch_page() end a run with an exception too
+        outcome = type(e).__name__
+        raise
+    finally:
+        wall = (time.perf_counter() - start) * 1000
+        del ctx.enqueue  # back to the class method
+        _local.run = None
+        phases = {name: round(ms, 3) for name, ms in run["phases"].items()}
+        phases["compute"] = round(wall - sum(run["phases"].values()), 3)
+        json_lines_log(PAGE_METRICS, {
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "page": page,
+            "session": ctx.session_id,
+            "rerun": _rerun_count(page),
+            "outcome": outcome,
+            "wall_ms": round(wall, 3),
+            "phases": phases,
+            "elements": run["elements"],
+            "widgets": run["widgets"],
+        })
+
+
+# ── Metrics summary ──────────────────────────────────────────────────────────
+
+def read_metrics(path=PAGE_METRICS):
+    """Records of the metrics file and its rotated backups, oldest first."""
+    records = []
+    for suffix in [f".{n}" for n in range(LOG_BACKUPS, 0, -1)] + [""]:
+        if os.path.exists(path + suffix):
+            with open(path + suffix) as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+def summarize_metrics(records):
+    """Per page: reruns, sessions, reruns per session, wall time and phase means, elements per rerun."""
+    by_page = {}
+    for record in records:
+        by_page.setdefault(record["page"], []).append(record)
+
+    summary = {}
+    for page, runs in by_page.items():
+        wall = np.array([run["wall_ms"] for run in runs])
+        sessions = {run["session"] for run in runs}
+        phases = sorted({name for run in runs for name in run["phases"]})
+        summary[page] = {
+            "reruns": len(runs),
+            "sessions": len(sessions),
+            "reruns_per_session": round(len(runs) / len(sessions), 1),
+            "total_s": round(float(wall.sum()) / 1000, 3),
+            "p50_ms": round(float(np.percentile(wall, 50)), 3),
+            "p95_ms": round(float(np.percentile(wall, 95)), 3),
+            **{f"{name}_ms": round(float(np.mean([run["phases"].get(name, 0) for run in runs])), 3)
+               for name in phases},
+            "elements": round(float(np.mean([run["elements"] for run in runs])), 1),
+            "widgets": round(float(np.mean([run["widgets"] for run in runs])), 1),
+        }
+    # Costliest screens first
+    return dict(sorted(summary.items(), key=lambda item: item[1]["total_s"], reverse=True))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.profiler",
+                                     description="Summarize page render metrics per page.")
+    parser.add_argument("--file", default=PAGE_METRICS, help="metrics file (default: POS_PAGE_METRICS)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = summarize_metrics(read_metrics(args.file))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    if not summary:
+        print(f"No metrics in {args.file} (run the app with POS_PAGE_PROFILE=1)")
+        return
+    print(f"{'page':<22}{'reruns':>8}{'/session':>10}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'db ms':>8}{'emit ms':>9}{'elements':>10}{'widgets':>9}")
+    for page, stats in summary.items():
+        print(f"{page:<22}{stats['reruns']:>8}{stats['reruns_per_session']:>10.1f}{stats['total_s']:>10.2f}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats.get('db_ms', 0):>8.2f}"
+              f"{stats.get('emit_ms', 0):>9.2f}{stats['elements']:>10.1f}{stats['widgets']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
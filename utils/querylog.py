@@ -0,0 +1,265 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import streamlit as st
+
+# ── Query instrumentation ────────────────────────────────────────────────────
+# Opt-in tracing of the SQL run on pooled and dedicated connections. When on,
+# utils/database.py opens connections whose cursors record every statement's
+# time, row count and call site (page and function). Statements slower than
+# SLOW_QUERY_MS go, with their EXPLAIN QUERY PLAN, to a rolling JSON-lines
+# log. Each Streamlit rerun runs on its own thread, so the statements of the
+# current thread are the statements of the current rerun; query_log_panel()
+# summarizes them in the sidebar and points at statements repeated per row.
+#
+#   POS_QUERY_LOG=1 streamlit run Home.py
+#
+# Tracing is process-wide, so it is only switched by the environment (or
+# set_enabled() from tools); the sidebar toggle shows or hides the summary
+# for one session.
+
+SLOW_QUERY_MS = float(os.environ.get("POS_SLOW_QUERY_MS", 50))
+SLOW_QUERY_LOG = os.environ.get("POS_SLOW_QUERY_LOG",
+                                os.path.expanduser("~/.local/share/pos/logs/slow_queries.log"))
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+
+# Statements kept per thread (long-lived background threads stay bounded)
+MAX_RUN_QUERIES = 2000
+
+# The same statement this many times in one rerun is probably a per-row (N+1) query
+REPEATED_QUERY_COUNT = 5
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+enabled = os.environ.get("POS_QUERY_LOG", "") not in ("", "0")
+_local = threading.local()
+_loggers = {}
+_logger_lock = threading.Lock()
+
+
+def set_enabled(on):
+    """Connections opened from now on are traced (or not); open ones keep their mode."""
+    global enabled
+    enabled = bool(on)
+
+def run_queries():
+    """Statements recorded on this thread (this rerun): dicts with sql, ms, rows, page, site."""
+    queries = getattr(_local, "queries", None)
+    if queries is None:
+        queries = _local.queries = deque(maxlen=MAX_RUN_QUERIES)
+    return queries
+
+def _call_site():
+    """(page, "file:function:line") of the innermost repo frame outside this module and pandas/sqlite."""
+    page = site = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(_REPO_DIR) and path != __file__:
+            relative = os.path.relpath(path, _REPO_DIR)
+            if site is None:
+                site = f"{relative}:{frame.f_code.co_name}:{frame.f_lineno}"
+            if relative.startswith("pages") or relative == "Home.py":
+                page = relative
+        frame = frame.f_back
+    return page, site
+
+def json_lines_log(path, record):
+    """Append record as one JSON line to a rotating log file (LOG_MAX_BYTES, LOG_BACKUPS)."""
+    with _logger_lock:
+        logger = _loggers.get(path)
+        if logger is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+            logger = _loggers[path] = logging.getLogger(f"pos.log.{path}")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+    logger.info(json.dumps(record))
+
+def _query_plan(conn, sql, params):
+    try:
+        cursor = sqlite3.Cursor(conn)  # untraced
+        return [row[-1] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    except (sqlite3.Error, ValueError):
+        return None
+
+def _log_slow(conn, record, params):
+    json_lines_log(SLOW_QUERY_LOG, {
+        "at": datetime.now().isoformat(timespec="milliseconds"),
+        "ms": round(record["ms"], 2),
+        "rows": record["rows"],
+        "page": record["page"],
+        "site": record["site"],
+        "sql": record["sql"],
+        "plan": _query_plan(conn, record["sql"], params),
+    })
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times its statement, including fetches, and counts the rows read."""
+
+    _record = None
+    _params = ()
+
+    def _start(self, sql, params):
+        self._finish()
+        page, site = _call_site()
+        self._record = {"sql": " ".join(sql.split()), "ms": 0.0, "rows": 0, "page": page, "site": site}
+        self._params = params
+        run_queries().append(self._record)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._record is not None:
+                self._record["ms"] += (time.perf_counter() - start) * 1000
+
+    def _finish(self):
+        record, self._record = self._record, None
+        if record is not None and record["ms"] >= SLOW_QUERY_MS:
+            _log_slow(self.connection, record, self._params)
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        self._timed(super().execute, sql, params)
+        if self.description is None:
+            # No result rows to wait for
+            self._record["rows"] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self._start(sql, seq_of_params[0] if seq_of_params else ())
+        self._timed(super().executemany, sql, seq_of_params)
+        self._record["rows"] = max(self.rowcount, 0)
+        self._finish()
+        return self
+
+    def executescript(self, sql_script):
+        self._start(sql_script, ())
+        self._timed(super().executescript, sql_script)
+        self._record = None  # scripts are not explained
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._record is not None:
+            self._record["rows"] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._record is not None:
+            self._record["rows"] += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._record is not None:
+            self._record["rows"] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._record is not None:
+            self._record["rows"] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class TracingConnection:
+    """Mixin for sqlite3.Connection subclasses: every cursor is a TracedCursor."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+_traced_factories = {}
+
+def traced_factory(factory):
+    """The tracing variant of a sqlite3.Connection subclass."""
+    traced = _traced_factories.get(factory)
+    if traced is None:
+        traced = _traced_factories[factory] = type(f"Traced{factory.__name__}", (TracingConnection, factory), {})
+    return traced
+
+def is_traced(conn):
+    return isinstance(conn, TracingConnection)
+
+
+# ── Per-rerun summary ────────────────────────────────────────────────────────
+
+def summarize(queries):
+    """Group statements by SQL text: calls, total ms, rows and call sites, slowest first."""
+    by_sql = {}
+    for query in queries:
+        entry = by_sql.setdefault(query["sql"], {"sql": query["sql"], "calls": 0, "ms": 0.0, "rows": 0, "sites": set()})
+        entry["calls"] += 1
+        entry["ms"] += query["ms"]
+        entry["rows"] += query["rows"]
+        entry["sites"].add(query["site"] or "?")
+    return sorted(by_sql.values(), key=lambda entry: entry["ms"], reverse=True)
+
+def query_log_panel():
+    """
+    When tracing is on (POS_QUERY_LOG), a sidebar toggle for this session and
+    a summary of the statements run so far in this rerun. Call it at the end
+    of a page.
+    """
+    if not enabled:
+        return
+    if not st.sidebar.toggle("Query log", value=True, key="query_log",
+                             help=f"Show the SQL traced in this rerun; statements slower than "
+                                  f"{SLOW_QUERY_MS:g} ms are logged to {SLOW_QUERY_LOG}"):
+        return
+
+    queries = list(run_queries())
+    statements = summarize(queries)
+    with st.sidebar.expander(f"{len(queries)} queries, {sum(q['ms'] for q in queries):.1f} ms", expanded=True):
+        if not queries:
+            st.caption("No queries traced yet in this rerun (connections opened before the toggle are not traced).")
+            return
+        for entry in statements:
+            if entry["calls"] >= REPEATED_QUERY_COUNT:
+                st.warning(f"Run {entry['calls']}× in one rerun (N+1?): {entry['sql'][:120]}")
+        st.dataframe(
+            [{"calls": e["calls"], "ms": round(e["ms"], 2), "rows": e["rows"],
+              "slow": "⚠️" if e["ms"] / e["calls"] >= SLOW_QUERY_MS else "",
+              "sql": e["sql"], "sites": ", ".join(sorted(e["sites"]))} for e in statements],
+            hide_index=True, width='stretch')
@@ -0,0 +1,136 @@
+import pandas as pd
+from datetime import timedelta
+from utils.archive import history_sources
+from utils.tax import get_tax_table
+
+# ── Transaction history reports ──────────────────────────────────────────────
+# Date filters are half-open ranges on the raw timestamp column,
+# `timestamp >= start AND timestamp < day after end`, so SQLite can use
+# idx_order_history_timestamp instead of evaluating DATE() on every row.
+# Ranges that reach into archived months also read the archive files
+# (utils/archive.history_sources); an order lives in exactly one of them.
+# Pages pass a report_snapshot() connection (utils/database.py). Tax columns
+# are added by the tax engine (utils/tax.py), one pass per result.
+
+TRANSACTION_QUERY = """
+    SELECT
+        oh.order_id,
+        CASE oh.order_status
+            WHEN 1 THEN 'order created'
+            WHEN 2 THEN 'order confirmed'
+            WHEN 3 THEN 'order paid'
+            WHEN 4 THEN 'order voided'
+            ELSE 'unknown'
+        END AS order_status,
+        oh.timestamp,
+        op.product_id,
+        -- unit price and tax as stored on the order line when it was ordered
+        (op.unit_price + op.modifier_total) as price,
+        op.product_quantity,
+        ((op.unit_price + op.modifier_total) * op.product_quantity) as subtotal,
+        op.tax_rate,
+        oh.rowid AS history_id,
+        COALESCE(op.order_product_id, 0) AS line_id
+    FROM Order_History oh
+    LEFT JOIN Order_Product op ON oh.order_id = op.order_id
+    WHERE oh.timestamp >= :start AND oh.timestamp < :end {page_filter}
+    ORDER BY oh.timestamp DESC, oh.order_id, oh.rowid, COALESCE(op.order_product_id, 0)
+    {limit}
+"""
+
+# Rows after the cursor in the sort order above: timestamp descending, then
+# order, history row and line ascending. The leading `timestamp <= :ts`
+# bounds the index range; the rest breaks ties within one timestamp.
+PAGE_FILTER = """
+    AND oh.timestamp <= :ts
+    AND (oh.timestamp < :ts
+         OR oh.order_id > :order_id
+         OR (oh.order_id = :order_id
+             AND (oh.rowid > :history_id
+                  OR (oh.rowid = :history_id AND COALESCE(op.order_product_id, 0) > :line_id))))
+"""
+
+# Cursor columns, used by the query only
+KEY_COLUMNS = ["history_id", "line_id"]
+SORT_COLUMNS = ["timestamp", "order_id", "history_id", "line_id"]
+SORT_ASCENDING = [False, True, True, True]
+
+def timestamp_range(start_date, end_date):
+    """Half-open timestamp bounds covering start_date through end_date inclusive."""
+    return start_date.isoformat(), (end_date + timedelta(days=1)).isoformat()
+
+def _merge_sources(frames):
+    """
+    One frame, in sort order, from the rows of each history source. Empty
+    frames are left out: concatenating them would turn the integer columns
+    into object columns.
+    """
+    rows = [frame for frame in frames if not frame.empty]
+    if not rows:
+        return frames[0]
+    if len(rows) == 1:
+        return rows[0]
+    return pd.concat(rows, ignore_index=True).sort_values(
+        SORT_COLUMNS, ascending=SORT_ASCENDING, kind="stable").reset_index(drop=True)
+
+def get_transactions(conn, start_date, end_date):
+    """Order history rows with their lines for the date range, newest first."""
+    start, end = timestamp_range(start_date, end_date)
+    frames = [
+        pd.read_sql_query(TRANSACTION_QUERY.format(page_filter="", limit=""),
+                          source, params={"start": start, "end": end})
+        for source in history_sources(conn, start, end)
+    ]
+    df = _merge_sources(frames)
+    return get_tax_table().add_tax_columns(df.drop(columns=KEY_COLUMNS))
+
+def count_transactions(conn, start_date, end_date):
+    """Number of rows get_transactions would return (index-only on both tables)."""
+    start, end = timestamp_range(start_date, end_date)
+    return sum(source.execute("""
+        SELECT COUNT(*)
+        FROM Order_History oh
+        LEFT JOIN Order_Product op ON oh.order_id = op.order_id
+        WHERE oh.timestamp >= ? AND oh.timestamp < ?
+    """, (start, end)).fetchone()[0] for source in history_sources(conn, start, end))
+
+def get_transaction_page(conn, start_date, end_date, page_size, after=None):
+    """
+    One page of transaction rows using keyset pagination.
+    after is the cursor returned with the previous page (None for the first).
+    Each source returns at most page_size + 1 rows after the cursor; the
+    page is the first of those in sort order.
+    Returns: (DataFrame, cursor of the next page or None on the last page)
+    """
+    start, end = timestamp_range(start_date, end_date)
+    params = {"start": start, "end": end, "page_size": page_size + 1}
+    if after is not None:
+        params.update(zip(("ts", "order_id", "history_id", "line_id"), after))
+    frames = [
+        pd.read_sql_query(TRANSACTION_QUERY.format(
+            page_filter=PAGE_FILTER if after is not None else "", limit="LIMIT :page_size"),
+            source, params=params)
+        for source in history_sources(conn, start, end)
+    ]
+    df = _merge_sources(frames).head(page_size + 1)
+
+    cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        cursor = (last["timestamp"], int(last["order_id"]), int(last["history_id"]), int(last["line_id"]))
+    return get_tax_table().add_tax_columns(df.drop(columns=KEY_COLUMNS)), cursor
+
+def get_sales_summary(conn, start_date, end_date):
+    """Paid orders, items, quantity and revenue for the range, read from Daily_Sales (one row per day)."""
+    result = conn.execute("""
+        SELECT SUM(orders), SUM(items), SUM(quantity), SUM(revenue)
+        FROM Daily_Sales
+        WHERE sales_date >= ? AND sales_date <= ?
+    """, (start_date.isoformat(), end_date.isoformat())).fetchone()
+    return {
+        'total_orders': result[0] or 0,
+        'total_items': result[1] or 0,
+        'total_quantity': result[2] or 0,
+        'total_revenue': result[3] or 0
+    }
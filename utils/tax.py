@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.catalog import get_menu_catalog
+from utils.money import RATE_SCALE, DEFAULT_TAX_RATE, rate_units, line_tax_units
+
+# ── Tax engine ───────────────────────────────────────────────────────────────
+# The one place sales tax is computed. Each order line is taxed on its amount,
+# (unit price + options) × quantity, at its rate and rounded half away from
+# zero to the cent (money.line_tax), the same as the update_order_totals_*
+# triggers; an order's tax is the sum of its lines' tax. A line's rate is
+# the one stored on it when it was ordered (Order_Product.tax_rate), else its
+# product's rate (Product.tax), else DEFAULT_TAX_RATE.
+#
+# Product rates are kept in milli-percent in an array indexed by product_id,
+# rebuilt when the menu changes, so a whole bill, an order list or a report
+# range is taxed in one vectorized pass.
+
+
+class TaxTable:
+    """Product tax rates (milli-percent) indexed by product_id, for one load of the menu."""
+
+    def __init__(self, catalog):
+        self.catalog_loads = catalog.loads
+        self.default_units = int(rate_units(DEFAULT_TAX_RATE))
+        self.rates = np.full(max(catalog.products, default=0) + 1, self.default_units, dtype=np.int64)
+        taxed = [p for p in catalog.products.values() if p.tax is not None]
+        self.rates[[p.product_id for p in taxed]] = rate_units([p.tax for p in taxed])
+
+    def product_rate(self, product_id):
+        """Rate of a product in percent (the default for unknown or untaxed products)."""
+        return self.line_units([product_id])[0] / RATE_SCALE
+
+    def line_units(self, product_ids, line_rates=None):
+        """Rate of each line in milli-percent: its stored rate, else its product's, else the default."""
+        ids = pd.to_numeric(pd.Series(product_ids, dtype=object), errors="coerce").to_numpy(dtype=float)
+        known = ~np.isnan(ids) & (ids >= 0) & (ids < len(self.rates))
+        units = np.full(len(ids), self.default_units, dtype=np.int64)
+        units[known] = self.rates[ids[known].astype(np.int64)]
+        if line_rates is not None:
+            stored = pd.to_numeric(pd.Series(line_rates, dtype=object), errors="coerce").to_numpy(dtype=float)
+            has_rate = ~np.isnan(stored)
+            units[has_rate] = rate_units(stored[has_rate])
+        return units
+
+    def line_tax(self, amounts, product_ids, line_rates=None):
+        """Tax in cents of each line amount."""
+        return line_tax_units(amounts, self.line_units(product_ids, line_rates))
+
+    def order_tax(self, order_ids, amounts, product_ids, line_rates=None):
+        """{order_id: tax in cents}, summing the lines of each order."""
+        taxes = pd.Series(self.line_tax(amounts, product_ids, line_rates)).groupby(
+            np.asarray(order_ids), sort=False).sum()
+        return {order_id: int(tax) for order_id, tax in taxes.items()}
+
+    def add_tax_columns(self, df):
+        """
+        Report rows with tax: from product_id, tax_rate, price (unit) and
+        subtotal, add tax (per unit), total_tax and total_amount and drop
+        tax_rate. Rows without a line (no product) get no tax.
+        """
+        has_line = df["price"].notna()
+        units = self.line_units(df["product_id"], df["tax_rate"])
+        for column, amounts in (("tax", df["price"]), ("total_tax", df["subtotal"])):
+            taxes = line_tax_units(amounts.fillna(0).astype(np.int64), units)
+            df[column] = pd.Series(taxes, index=df.index, dtype="Int64").where(has_line)
+        df["total_amount"] = df["subtotal"] + df["total_tax"]
+        return df.drop(columns="tax_rate")
+
+
+_tax_table = None
+_tax_lock = threading.Lock()
+
+def get_tax_table():
+    """The shared tax lookup table, rebuilt when the menu changed."""
+    global _tax_table
+    catalog = get_menu_catalog()
+    with _tax_lock:
+        if _tax_table is None or _tax_table.catalog_loads != catalog.loads:
+            _tax_table = TaxTable(catalog)
+        return _tax_table
@@ -1,6 +1,7 @@
 # Custom CSS for styling
 import streamlit as st
 import datetime
+from utils.money import format_cents, split_evenly
 
 # # Format price from integer to dollar format
 # def format_price(price_cents):
@@ -32,17 +33,10 @@ def format_timestamp(timestamp_str):
     
 #     return amounts
 
-# Format price helper
+# Format price helper (integer cents, see utils.money for whole columns)
 def format_price(cents):
-    return f"${cents / 100:.2f}"
+    return format_cents(cents)
 
 # Calculate split amounts
 def calculate_split_amounts(total, split_count):
-    base_amount = total // split_count
-    remainder = total % split_count
-    
-    amounts = [base_amount] * split_count
-    for i in range(remainder):
-        amounts[i] += 1
-    
-    return amounts
\ No newline at end of file
+    return split_evenly(total, split_count).tolist()
\ No newline at end of file
@@ -0,0 +1,188 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+# ── Write queue ──────────────────────────────────────────────────────────────
+# SQLite allows one writer at a time, so terminals committing on their own
+# connections queue up on the database lock (and time out under load). Here
+# every write is a request handed to one writer thread with one connection.
+# The writer takes whatever requests have queued up while it was busy and
+# runs them as one transaction (group commit): each request in its own
+# SAVEPOINT, so a failing request is rolled back alone, then one COMMIT for
+# all. Callers get a Future, or block on write() for the result. Taking the
+# lock is retried with backoff when another process (an archive run, a second
+# app instance) holds it past busy_timeout.
+
+# Requests committed together at most
+MAX_BATCH = 64
+
+# Attempts to take the write lock / commit before giving up, and the first backoff
+BUSY_ATTEMPTS = 6
+BUSY_BACKOFF_SECONDS = 0.05
+
+# Seconds write() waits for its result before raising TimeoutError
+WRITE_TIMEOUT_SECONDS = 30
+
+_STOP = object()
+
+
+def is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and (
+        "locked" in str(error) or "busy" in str(error))
+
+class WriteRequest:
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class WriteQueue:
+    """One writer thread applying write requests in group commits.
+
+    A request is fn(conn, *args, **kwargs). It runs inside the writer's
+    transaction and must not commit or roll back itself; raising rolls back
+    just that request. The return value resolves the request's Future once
+    the group is committed.
+    """
+
+    def __init__(self, connect, max_batch=MAX_BATCH):
+        self._connect = connect
+        self.max_batch = max_batch
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.requests = 0
+        self.failed = 0
+        self.largest_batch = 0
+        self.busy_retries = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(conn, *args, **kwargs); returns a concurrent.futures.Future."""
+        request = WriteRequest(fn, args, kwargs)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pos-writer", daemon=True)
+                self._thread.start()
+            self._requests.put(request)
+        return request.future
+
+    def write(self, fn, *args, timeout=WRITE_TIMEOUT_SECONDS, **kwargs):
+        """Run fn(conn, *args, **kwargs) on the writer and return its result (or raise its error, or TimeoutError)."""
+        return self.submit(fn, *args, **kwargs).result(timeout)
+
+    def close(self):
+        """Finish queued requests and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._requests.put(_STOP)
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "failed": self.failed,
+            "largest_batch": self.largest_batch,
+            "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            "busy_retries": self.busy_retries,
+            "queued": self._requests.qsize(),
+        }
+
+    # Writer thread
+
+    def _retry_busy(self, step):
+        delay = BUSY_BACKOFF_SECONDS
+        for attempt in range(BUSY_ATTEMPTS):
+            try:
+                return step()
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or attempt == BUSY_ATTEMPTS - 1:
+                    raise
+                self.busy_retries += 1
+                time.sleep(delay)
+                delay *= 2
+
+    def _next_batch(self):
+        """Block for one request, then take what else is already queued (up to max_batch)."""
+        batch = [self._requests.get()]
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            try:
+                batch.append(self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, conn, batch):
+        """Run one group; returns [(request, result, error)]."""
+        self._retry_busy(lambda: conn.execute("BEGIN IMMEDIATE"))
+        outcomes = []
+        try:
+            for request in batch:
+                conn.execute("SAVEPOINT write_request")
+                try:
+                    result = request.fn(conn, *request.args, **request.kwargs)
+                    conn.execute("RELEASE write_request")
+                    outcomes.append((request, result, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_request")
+                    conn.execute("RELEASE write_request")
+                    outcomes.append((request, None, e))
+            self._retry_busy(conn.commit)
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        return outcomes
+
+    def _fail_queued(self, error):
+        """The writer could not start: fail what is queued and let the next submit start a new one."""
+        with self._lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
+            while True:
+                try:
+                    request = self._requests.get_nowait()
+                except queue.Empty:
+                    return
+                if request is not _STOP:
+                    self.failed += 1
+                    request.future.set_exception(error)
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self._fail_queued(e)
+            return
+        try:
+            while True:
+                batch = self._next_batch()
+                stop = batch[-1] is _STOP
+                if stop:
+                    batch.pop()
+                if batch:
+                    try:
+                        outcomes = self._apply(conn, batch)
+                    except Exception as e:
+                        # The group could not be committed: nothing in it was written
+                        outcomes = [(request, None, e) for request in batch]
+                    self.batches += 1
+                    self.requests += len(batch)
+                    self.largest_batch = max(self.largest_batch, len(batch))
+                    for request, result, error in outcomes:
+                        if error is None:
+                            request.future.set_result(result)
+                        else:
+                            self.failed += 1
+                            request.future.set_exception(error)
+                if stop:
+                    return
+        finally:
+            conn.close()